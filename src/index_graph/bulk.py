@@ -0,0 +1,290 @@
+"""Bulk ingestion of a document manifest into the vector store.
+
+The index graph handles a single URL per invocation. This module loads a whole
+corpus from a JSONL or CSV manifest of `InputState` records and runs the
+download → extract → split → embed → upsert stages concurrently, connected by bounded
+queues so that a slow stage applies back-pressure instead of buffering the
+corpus in memory. Completed URLs are appended to a checkpoint file, which lets
+an interrupted run resume where it stopped.
+
+Usage:
+    python -m index_graph.bulk manifest.jsonl --checkpoint ingest.checkpoint
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import time
+from dataclasses import dataclass, fields
+from typing import Any, Awaitable, Callable, Optional
+
+from langchain_core.runnables import RunnableConfig
+
+from index_graph.configuration import IndexConfiguration
+from index_graph.graph import build_metadata, split_text
+from index_graph.incremental import make_validator_store, new_chunks, upsert_document
+from index_graph.pdf_parser import NOT_MODIFIED, PDFParser
+from index_graph.state import InputState
+from shared import clients, retrieval
+from shared.rate_limit import BACKGROUND, priority
+
+# Returned by a stage for an item that needs no further work (not a failure)
+SKIPPED: dict[str, Any] = {}
+
+
+@dataclass(kw_only=True)
+class StageStats:
+    """Throughput counters for one pipeline stage."""
+
+    workers: int
+    processed: int = 0
+    skipped: int = 0
+    failed: int = 0
+    busy_seconds: float = 0.0
+
+    @property
+    def load(self) -> float:
+        """Busy time per worker, used to spot the bottleneck stage."""
+        return self.busy_seconds / self.workers
+
+
+@dataclass(kw_only=True)
+class BulkIngestConfig:
+    """Worker counts and queue size for each stage of the bulk pipeline."""
+
+    download_workers: int = 16
+    extract_workers: int = 8
+    split_workers: int = 2
+    embed_workers: int = 4
+    upsert_workers: int = 4
+    queue_size: int = 32
+    report_every: int = 50
+
+
+def load_manifest(path: str) -> list[InputState]:
+    """Read a JSONL or CSV manifest of documents to index."""
+    allowed = {f.name for f in fields(InputState)}
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith(".csv"):
+            rows: list[dict[str, Any]] = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    return [
+        InputState(**{k: str(v) for k, v in row.items() if k in allowed})
+        for row in rows
+    ]
+
+
+def load_checkpoint(path: str) -> set[str]:
+    """Return the URLs already indexed by a previous run."""
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+async def _run_stage(
+    name: str,
+    fn: Callable[[dict[str, Any]], Awaitable[Optional[dict[str, Any]]]],
+    inbox: "asyncio.Queue[Optional[dict[str, Any]]]",
+    outbox: "Optional[asyncio.Queue[Optional[dict[str, Any]]]]",
+    stats: StageStats,
+) -> None:
+    """Consume items from `inbox` until a sentinel, forwarding results to `outbox`."""
+    while True:
+        item = await inbox.get()
+        if item is None:
+            return
+        started = time.monotonic()
+        try:
+            result = await fn(item)
+        except Exception as e:
+            print(f"❌ [{name}] {item['state'].url}: {e}")
+            result = None
+        stats.busy_seconds += time.monotonic() - started
+        if result is SKIPPED:
+            stats.skipped += 1
+            continue
+        if result is None:
+            stats.failed += 1
+            continue
+        stats.processed += 1
+        if outbox is not None:
+            await outbox.put(result)
+
+
+async def ingest(
+    manifest_path: str,
+    checkpoint_path: str,
+    *,
+    config: Optional[RunnableConfig] = None,
+    bulk_config: Optional[BulkIngestConfig] = None,
+) -> dict[str, StageStats]:
+    """Index every document of a manifest, skipping those already checkpointed.
+
+    Args:
+        manifest_path (str): Path to the JSONL or CSV manifest.
+        checkpoint_path (str): File where completed URLs are appended.
+        config (Optional[RunnableConfig]): Configuration used to build the retriever.
+        bulk_config (Optional[BulkIngestConfig]): Worker counts and queue size.
+
+    Returns:
+        dict[str, StageStats]: Per-stage throughput counters.
+    """
+    bulk_config = bulk_config or BulkIngestConfig()
+    done = load_checkpoint(checkpoint_path)
+    pending = [s for s in load_manifest(manifest_path) if s.url not in done]
+    print(f"📚 {len(pending)} document(s) à indexer ({len(done)} déjà faits)")
+
+    configuration = IndexConfiguration.from_runnable_config(config)
+    pdf_parser = PDFParser(max_calls_per_document=configuration.extraction_call_budget)
+    started = time.monotonic()
+    checkpoint = open(checkpoint_path, "a", encoding="utf-8")
+    stats: dict[str, StageStats] = {}
+
+    async def download(item: dict[str, Any]) -> Optional[dict[str, Any]]:
+        pdf = await pdf_parser.download_pdf(item["state"].url)
+        if pdf is NOT_MODIFIED:
+            # Unchanged since its last successful indexing: already done
+            checkpoint.write(item["state"].url + "\n")
+            checkpoint.flush()
+            return SKIPPED
+        validators = pdf_parser.take_validators(item["state"].url)
+        return {**item, "pdf": pdf, "validators": validators} if pdf else None
+
+    async def extract(item: dict[str, Any]) -> Optional[dict[str, Any]]:
+        text, complete = await pdf_parser.extract_text_from_pdf(item["pdf"])
+        return {**item, "text": text, "complete": complete} if text else None
+
+    async def split(item: dict[str, Any]) -> Optional[dict[str, Any]]:
+        docs = split_text(item["text"], build_metadata(item["state"]))
+        return {**item, "docs": docs}
+
+    # Stage tasks inherit the background priority: interactive retrieval
+    # traffic keeps precedence on the shared provider quotas
+    with priority(BACKGROUND), retrieval.make_retriever(config or {}) as retriever:
+
+        async def embed(item: dict[str, Any]) -> Optional[dict[str, Any]]:
+            # Warms the embedding cache for new chunks so the upsert stage
+            # only hits the store
+            chunks = new_chunks(item["state"].url, item["docs"])
+            await retriever.vectorstore.embeddings.aembed_documents(
+                [doc.page_content for doc in chunks]
+            )
+            return item
+
+        async def upsert(item: dict[str, Any]) -> Optional[dict[str, Any]]:
+            _, _, failed = await upsert_document(
+                retriever,
+                item["state"].url,
+                item["docs"],
+                batch_size=configuration.upsert_batch_size,
+                max_concurrency=configuration.upsert_max_concurrency,
+                max_retries=configuration.upsert_max_retries,
+            )
+            if failed or not item["complete"]:
+                # Not checkpointed: the next run extracts the missing pages and
+                # writes (or deletes) the remaining chunks
+                return None
+            await asyncio.to_thread(
+                make_validator_store().set, item["state"].url, item["validators"]
+            )
+            checkpoint.write(item["state"].url + "\n")
+            checkpoint.flush()
+            indexed = stats["upsert"].processed + 1
+            if indexed % bulk_config.report_every == 0:
+                _report(stats, indexed, started)
+            return item
+
+        stages = [
+            ("download", download, bulk_config.download_workers),
+            ("extract", extract, bulk_config.extract_workers),
+            ("split", split, bulk_config.split_workers),
+            ("embed", embed, bulk_config.embed_workers),
+            ("upsert", upsert, bulk_config.upsert_workers),
+        ]
+        queues: list[asyncio.Queue[Optional[dict[str, Any]]]] = [
+            asyncio.Queue(maxsize=bulk_config.queue_size) for _ in stages
+        ]
+        stats.update({name: StageStats(workers=workers) for name, _, workers in stages})
+        workers = [
+            [
+                asyncio.create_task(
+                    _run_stage(
+                        name,
+                        fn,
+                        queues[i],
+                        queues[i + 1] if i + 1 < len(stages) else None,
+                        stats[name],
+                    )
+                )
+                for _ in range(count)
+            ]
+            for i, (name, fn, count) in enumerate(stages)
+        ]
+
+        try:
+            for state in pending:
+                await queues[0].put({"state": state})
+            # Drain each stage in turn: once a stage's workers have all seen
+            # their sentinel, nothing more can reach the next queue.
+            for queue, stage_workers in zip(queues, workers):
+                for _ in stage_workers:
+                    await queue.put(None)
+                await asyncio.gather(*stage_workers)
+        finally:
+            checkpoint.close()
+
+    _report(stats, stats["upsert"].processed, started)
+    return stats
+
+
+def _report(stats: dict[str, StageStats], indexed: int, started: float) -> None:
+    """Print throughput and the current bottleneck stage."""
+    minutes = max(time.monotonic() - started, 1e-6) / 60
+    slowest = max(stats, key=lambda name: stats[name].load)
+    failed = sum(s.failed for s in stats.values())
+    skipped = sum(s.skipped for s in stats.values())
+    print(
+        f"📈 {indexed} document(s) indexé(s), {skipped} inchangé(s), {failed} échec(s), "
+        f"{indexed / minutes:.1f} docs/min, étape la plus lente : {slowest}"
+    )
+
+
+def main() -> None:
+    """Run bulk ingestion from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("manifest", help="JSONL or CSV manifest of documents")
+    parser.add_argument("--checkpoint", default="ingest.checkpoint")
+    defaults = BulkIngestConfig()
+    for name in ("download", "extract", "split", "embed", "upsert"):
+        parser.add_argument(
+            f"--{name}-workers", type=int, default=getattr(defaults, f"{name}_workers")
+        )
+    parser.add_argument("--queue-size", type=int, default=defaults.queue_size)
+    args = parser.parse_args()
+
+    async def run() -> None:
+        try:
+            await ingest(
+                args.manifest,
+                args.checkpoint,
+                bulk_config=BulkIngestConfig(
+                    download_workers=args.download_workers,
+                    extract_workers=args.extract_workers,
+                    split_workers=args.split_workers,
+                    embed_workers=args.embed_workers,
+                    upsert_workers=args.upsert_workers,
+                    queue_size=args.queue_size,
+                ),
+            )
+        finally:
+            await clients.shutdown_clients()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
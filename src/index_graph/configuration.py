@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from shared.configuration import BaseConfiguration
 
@@ -18,4 +18,32 @@ class IndexConfiguration(BaseConfiguration):
 
     This class defines the parameters needed for configuring the indexing and
     retrieval processes, including embedding model selection, retriever provider choice, and search parameters.
-    """
\ No newline at end of file
+    """
+
+    extraction_call_budget: int = field(
+        default=40,
+        metadata={
+            "description": "Maximum number of LLM extraction calls per document, splits included."
+        },
+    )
+
+    upsert_batch_size: int = field(
+        default=100,
+        metadata={
+            "description": "Number of chunks sent to the vector store per upsert request."
+        },
+    )
+
+    upsert_max_concurrency: int = field(
+        default=4,
+        metadata={
+            "description": "Number of upsert requests in flight at the same time."
+        },
+    )
+
+    upsert_max_retries: int = field(
+        default=3,
+        metadata={
+            "description": "Retries of a failed upsert batch before it is left for the next run."
+        },
+    )
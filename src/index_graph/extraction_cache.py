@@ -0,0 +1,44 @@
+"""Persistent, content-addressed cache for LLM page extraction.
+
+Extracted text is stored in a local SQLite file, keyed by a hash of the page
+content together with the extraction model and prompt. Identical pages (an
+unchanged document re-indexed, or boilerplate shared across reports) are
+therefore only ever sent to the LLM once. Entries are evicted in least
+recently used order once the stored text exceeds a size budget.
+"""
+
+import hashlib
+from typing import Iterable, Optional
+
+from shared.cache import SQLiteCache
+
+
+def make_cache_key(page_digests: Iterable[str], model: str, prompt: str) -> str:
+    """Build the cache key for a group of pages extracted with a given model and prompt.
+
+    Args:
+        page_digests (Iterable[str]): Content hashes of the pages, in order.
+        model (str): Name of the extraction model.
+        prompt (str): Extraction prompt sent alongside the pages.
+
+    Returns:
+        str: A hex SHA-256 digest identifying the extraction.
+    """
+    hasher = hashlib.sha256()
+    for part in (model, prompt, *page_digests):
+        hasher.update(part.encode("utf-8"))
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+class ExtractionCache(SQLiteCache):
+    """Text view over `SQLiteCache` for extracted page content."""
+
+    def get_text(self, key: str) -> Optional[str]:
+        """Return the cached text for `key`, or None on a miss."""
+        value = self.get(key)
+        return value.decode("utf-8") if value is not None else None
+
+    def put_text(self, key: str, text: str) -> None:
+        """Store extracted `text` under `key`."""
+        self.put(key, text.encode("utf-8"))
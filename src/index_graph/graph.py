@@ -1,34 +1,57 @@
 """This "graph" simply exposes an endpoint for a user to upload docs to be indexed."""
+
+import asyncio
 from typing import Optional
 
+from langchain_core.documents import Document
 from langchain_core.runnables import RunnableConfig
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langgraph.graph import END, START, StateGraph
 
 from index_graph.configuration import IndexConfiguration
+from index_graph.incremental import make_validator_store, upsert_document
 from index_graph.pdf_parser import PDFParser
 from index_graph.state import IndexState, InputState
 from shared import retrieval
+from shared.rate_limit import BACKGROUND, priority
+
+
+def build_metadata(state: InputState) -> dict[str, str]:
+    """Build the metadata attached to every chunk of a document."""
+    return {
+        "title": state.title,
+        "publication_year": state.publication_year,
+        "publisher": state.publisher,
+        "url": state.url,
+        "project_code": state.project_code,
+    }
+
+
+def split_text(text: str, metadata: dict[str, str]) -> list[Document]:
+    """Split the extracted text of a document into chunks ready to be indexed."""
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    return text_splitter.create_documents([text], metadatas=[metadata])
 
 
 async def retreive_pdf(
     state: InputState, *, config: Optional[RunnableConfig] = None
 ) -> dict[str, str]:
     """Retrieve the PDF from the URL."""
-    pdf_parser = PDFParser()
-    
-    text = await pdf_parser.process_pdf(state.url)
-    
-    metadata = {
-            "title": state.title,
-            "publication_year": state.publication_year,
-            "publisher": state.publisher,
-            "url": state.url,
-            "project_code": state.project_code,
-    }
+    configuration = IndexConfiguration.from_runnable_config(config)
+    pdf_parser = PDFParser(max_calls_per_document=configuration.extraction_call_budget)
+
+    text, complete = await pdf_parser.process_pdf(state.url)
+
+    metadata = build_metadata(state)
 
     if text:
-        return {"metadata": metadata, "pdf_text": text}
+        return {
+            "metadata": metadata,
+            "pdf_text": text,
+            "extraction_complete": complete,
+            "validators": pdf_parser.take_validators(state.url),
+            "extraction_stats": pdf_parser.last_stats,
+        }
     else:
         return {}
 
@@ -50,17 +73,33 @@ async def index_docs(
         config (Optional[RunnableConfig]): Configuration for the indexing process.r
     """
     if state.pdf_text:
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        docs = text_splitter.create_documents([state.pdf_text], metadatas=[state.metadata])
-        with retrieval.make_retriever(config) as retriever:
-                await retriever.aadd_documents(docs)
-                print(
-                    f"Indexed docs {docs}"
-                )
+        docs = split_text(state.pdf_text, state.metadata)
+        configuration = IndexConfiguration.from_runnable_config(config)
+        # Embedding calls yield to interactive retrieval traffic
+        with priority(BACKGROUND), retrieval.make_retriever(config) as retriever:
+            # Only new chunks are embedded and written, removed ones are deleted
+            added, removed, failed = await upsert_document(
+                retriever,
+                state.url,
+                docs,
+                batch_size=configuration.upsert_batch_size,
+                max_concurrency=configuration.upsert_max_concurrency,
+                max_retries=configuration.upsert_max_retries,
+            )
+            print(
+                f"Indexed {state.url}: {added} chunk(s) added, {removed} removed, {failed} failed"
+            )
+        # A later 304 would skip the document: only remember versions whose
+        # pages were all extracted and whose chunks were all written and deleted
+        if state.extraction_complete and failed == 0 and state.validators:
+            await asyncio.to_thread(
+                make_validator_store().set, state.url, state.validators
+            )
 
     # URL OK, intégrer index
     return {}
 
+
 # Define the graph
 builder = StateGraph(IndexState, input=InputState, config_schema=IndexConfiguration)
 builder.add_node(retreive_pdf)
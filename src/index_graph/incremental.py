@@ -0,0 +1,239 @@
+"""Incremental re-indexing of documents with deterministic chunk IDs.
+
+Every chunk gets an ID derived from its document URL and content, and a
+manifest records the chunk IDs indexed for each URL. Re-indexing a document
+then only upserts the chunks that are new and deletes the ones that
+disappeared, so an unchanged document costs no embedding call and no write.
+
+The HTTP validators (ETag, Last-Modified) of each fully indexed document are
+kept in a second table, so that an unchanged PDF is not even downloaded again.
+"""
+
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Awaitable, Callable, Optional
+
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStoreRetriever
+
+from shared import clients
+from shared.lexical import make_lexical_index
+from shared.state import generate_chunk_id
+
+
+class ChunkManifest:
+    """Chunk IDs indexed for each document URL, stored in a local SQLite file."""
+
+    def __init__(self, path: str) -> None:
+        """Open (or create) the manifest at `path`."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS manifest (url TEXT PRIMARY KEY, chunk_ids TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, url: str) -> set[str]:
+        """Return the chunk IDs currently indexed for `url`."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT chunk_ids FROM manifest WHERE url = ?", (url,)
+            ).fetchone()
+        return set(json.loads(row[0])) if row else set()
+
+    def set(self, url: str, chunk_ids: set[str]) -> None:
+        """Record `chunk_ids` as the indexed chunks of `url`."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO manifest (url, chunk_ids) VALUES (?, ?)",
+                (url, json.dumps(sorted(chunk_ids))),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        """Close the underlying SQLite connection."""
+        with self._lock:
+            self._conn.close()
+
+
+class ValidatorStore:
+    """HTTP validators of the last fully indexed version of each URL, in a local SQLite file."""
+
+    def __init__(self, path: str) -> None:
+        """Open (or create) the validator store at `path`."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS validators (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT)"
+        )
+        self._conn.commit()
+
+    def get(self, url: str) -> dict[str, str]:
+        """Return the ETag/Last-Modified recorded for `url`, if any."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified FROM validators WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return {}
+        return {
+            name: value for name, value in zip(("etag", "last_modified"), row) if value
+        }
+
+    def set(self, url: str, validators: dict[str, Optional[str]]) -> None:
+        """Record the validators of the version of `url` that was just indexed."""
+        if not validators.get("etag") and not validators.get("last_modified"):
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO validators (url, etag, last_modified) VALUES (?, ?, ?)",
+                (url, validators.get("etag"), validators.get("last_modified")),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        """Close the underlying SQLite connection."""
+        with self._lock:
+            self._conn.close()
+
+
+def make_chunk_manifest(path: Optional[str] = None) -> ChunkManifest:
+    """Return the process-wide chunk manifest."""
+    path = path or os.getenv("CHUNK_MANIFEST_PATH", ".cache/chunk_manifest.sqlite")
+    return clients.get_or_create(("chunk_manifest", path), lambda: ChunkManifest(path))
+
+
+def make_validator_store(path: Optional[str] = None) -> ValidatorStore:
+    """Return the process-wide store of HTTP validators."""
+    path = path or os.getenv("HTTP_VALIDATORS_PATH", ".cache/http_validators.sqlite")
+    return clients.get_or_create(
+        ("validator_store", path), lambda: ValidatorStore(path)
+    )
+
+
+def assign_chunk_ids(url: str, docs: list[Document]) -> list[Document]:
+    """Set deterministic IDs on the chunks of `url`, dropping duplicate chunks."""
+    unique: dict[str, Document] = {}
+    for doc in docs:
+        chunk_id = generate_chunk_id(url, doc.page_content)
+        if chunk_id not in unique:
+            unique[chunk_id] = Document(
+                id=chunk_id, page_content=doc.page_content, metadata=doc.metadata
+            )
+    return list(unique.values())
+
+
+def new_chunks(url: str, docs: list[Document]) -> list[Document]:
+    """Return the chunks of `url` (with IDs assigned) that are not indexed yet."""
+    indexed = make_chunk_manifest().get(url)
+    return [doc for doc in assign_chunk_ids(url, docs) if doc.id not in indexed]
+
+
+async def _with_retries(
+    operation: Callable[[], Awaitable[object]], max_retries: int, label: str
+) -> bool:
+    """Run `operation`, retrying with jittered exponential backoff; return whether it succeeded."""
+    for attempt in range(max_retries + 1):
+        try:
+            await operation()
+            return True
+        except Exception as e:
+            if attempt == max_retries:
+                print(f"❌ {label} en échec après {attempt + 1} tentative(s): {e}")
+                return False
+            delay = random.uniform(0.5, 1.0) * 2**attempt
+            print(
+                f"⏳ {label} (tentative {attempt + 1}): {e}. Pause de {delay:.1f}s..."
+            )
+            await asyncio.sleep(delay)
+    return False
+
+
+async def upsert_document(
+    retriever: VectorStoreRetriever,
+    url: str,
+    docs: list[Document],
+    *,
+    batch_size: int = 100,
+    max_concurrency: int = 4,
+    max_retries: int = 3,
+) -> tuple[int, int, int]:
+    """Bring the indexed chunks of `url` in line with `docs`.
+
+    New chunks are written in batches of `batch_size`, with up to
+    `max_concurrency` batches in flight. A failed batch is retried on its own;
+    if it still fails, its chunks are left out of the manifest so the next run
+    writes them again.
+
+    Args:
+        retriever (VectorStoreRetriever): Retriever whose vector store holds the chunks.
+        url (str): URL of the document the chunks come from.
+        docs (list[Document]): The current chunks of the document.
+        batch_size (int): Number of chunks per upsert request.
+        max_concurrency (int): Number of upsert requests in flight at once.
+        max_retries (int): Retries of a failed batch before giving up on it.
+
+    Returns:
+        tuple[int, int, int]: Number of chunks added, deleted, and failed (not
+        written, or not deleted and so still in the store).
+    """
+    manifest = make_chunk_manifest()
+    lexical_index = make_lexical_index()
+    docs = assign_chunk_ids(url, docs)
+    indexed = manifest.get(url)
+    current = {doc.id for doc in docs if doc.id}
+
+    added = [doc for doc in docs if doc.id not in indexed]
+    removed = sorted(indexed - current)
+    if not added and not removed:
+        return 0, 0, 0
+
+    started = time.monotonic()
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def write(batch: list[Document]) -> bool:
+        async with semaphore:
+            return await _with_retries(
+                lambda: retriever.aadd_documents(batch, ids=[doc.id for doc in batch]),
+                max_retries,
+                f"Upsert {url} ({len(batch)} chunks)",
+            )
+
+    batches = [added[i : i + batch_size] for i in range(0, len(added), batch_size)]
+    results = await asyncio.gather(*(write(batch) for batch in batches))
+    written = [doc for batch, ok in zip(batches, results) if ok for doc in batch]
+    failed = len(added) - len(written)
+    if written:
+        lexical_index.add_documents(written)
+
+    deleted = 0
+    if removed and await _with_retries(
+        lambda: retriever.vectorstore.adelete(ids=removed),
+        max_retries,
+        f"Suppression {url} ({len(removed)} chunks)",
+    ):
+        lexical_index.delete(removed)
+        deleted = len(removed)
+    failed += len(removed) - deleted
+
+    # The manifest only records what the store actually holds
+    indexed_now = (indexed - set(removed[:deleted])) | {doc.id for doc in written}
+    manifest.set(url, {chunk_id for chunk_id in indexed_now if chunk_id})
+
+    elapsed = max(time.monotonic() - started, 1e-6)
+    print(
+        f"📦 {url}: {len(written)} chunk(s) écrit(s), {deleted} supprimé(s), "
+        f"{failed} en échec, {(len(written) + deleted) / elapsed:.0f} lignes/s"
+    )
+    return len(written), deleted, failed
@@ -1,108 +1,530 @@
+import asyncio
 import base64
+import hashlib
+import multiprocessing
 import os
-import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import asyncio
+import random
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 
+import aiohttp
 import anthropic
 import fitz
-import requests
 from dotenv import load_dotenv
-import aiohttp
+
+from index_graph.extraction_cache import ExtractionCache, make_cache_key
+from index_graph.incremental import make_validator_store
+from shared import clients
+from shared.rate_limit import BACKGROUND, get_rate_limiter
+
+EXTRACTION_PROMPT = "Extract only the raw text from this PDF section in French, with no additional comments."
+
+# Estimation du nombre de tokens de sortie par page, pour dimensionner les chunks
+_CHARS_PER_TOKEN = 4
+_SCANNED_PAGE_TOKENS = 800
+# Coût en tokens d'entrée d'une page PDF (texte + image de la page)
+_PDF_PAGE_INPUT_TOKENS = 2000
+
+
+class _NotModified:
+    """Sentinelle fausse, comme une absence de PDF, mais distincte d'une erreur"""
+
+    def __bool__(self):
+        return False
+
+
+# Renvoyé par download_pdf quand le serveur répond 304 : le document n'a pas
+# changé depuis sa dernière indexation réussie
+NOT_MODIFIED = _NotModified()
+
+# Chargé une seule fois par processus
+load_dotenv()
+
+
+def _get_http_session():
+    """Retourne la session aiohttp partagée de la boucle courante (recréée si fermée)"""
+    key = ("aiohttp", id(asyncio.get_running_loop()))
+
+    def create_session():
+        connector = aiohttp.TCPConnector(limit=32, limit_per_host=8, ssl=False)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=30)
+        return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    session = clients.get_or_create(key, create_session)
+    if session.closed:
+        clients.discard(key)
+        session = clients.get_or_create(key, create_session)
+    return session
+
+
+def _get_process_pool(workers):
+    """Retourne le pool de processus partagé pour le travail PyMuPDF"""
+    # Pas de fork : le processus parent a des threads (boucle asyncio, pools,
+    # clients HTTP) dont les verrous seraient copiés dans un état incohérent
+    method = (
+        "forkserver"
+        if "forkserver" in multiprocessing.get_all_start_methods()
+        else "spawn"
+    )
+    return clients.get_or_create(
+        ("process_pool", workers),
+        lambda: ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context(method)
+        ),
+    )
+
+
+# Les fonctions suivantes tournent dans le pool de processus : elles sont au
+# niveau du module (picklables) et ne renvoient que des types simples.
+
+
+def _has_usable_text_layer(page, min_text_chars, max_image_coverage, max_garbled_ratio):
+    """Indique si la couche texte d'une page peut être utilisée sans LLM"""
+    text = page.get_text()
+    chars = [c for c in text if not c.isspace()]
+    if not chars:
+        return False
+
+    # Glyphes illisibles : caractère de remplacement, zone privée, contrôle
+    garbled = sum(
+        1
+        for c in chars
+        if c == "\ufffd" or "\ue000" <= c <= "\uf8ff" or not c.isprintable()
+    )
+    if garbled / len(chars) > max_garbled_ratio:
+        return False
+
+    if len(chars) >= min_text_chars:
+        return True
+
+    # Peu de texte : page scannée si les images couvrent une bonne partie
+    page_area = abs(page.rect) or 1
+    image_area = sum(
+        abs(fitz.Rect(info["bbox"]) & page.rect) for info in page.get_image_info()
+    )
+    return image_area / page_area < max_image_coverage
+
+
+def _page_profile(doc, page_index):
+    """Empreinte SHA-256, taille en octets et nombre de tokens estimé d'une page
+
+    L'empreinte couvre le sous-document PDF d'une page, avec toutes les
+    ressources qu'il référence (XObjects de formulaire, polices, images) : deux
+    pages au flux de contenu identique (`q /fzFrm0 Do Q`) mais au contenu
+    différent n'ont pas la même empreinte. Sans nouvel identifiant de fichier, la
+    même page donne la même empreinte d'un document à l'autre. Les pages
+    scannées n'ont pas de texte exploitable : on compte alors une page dense.
+    """
+    page = doc[page_index]
+    with fitz.open() as sub_doc:
+        sub_doc.insert_pdf(doc, from_page=page_index, to_page=page_index)
+        page_bytes = sub_doc.write(no_new_id=True)
+    text_tokens = len(page.get_text()) // _CHARS_PER_TOKEN
+    return {
+        "page": page_index,
+        "digest": hashlib.sha256(page_bytes).hexdigest(),
+        "size": len(page_bytes),
+        "tokens": max(text_tokens, _SCANNED_PAGE_TOKENS if page.get_images() else 1),
+    }
+
+
+def _open_pdf(source):
+    """Ouvre un PDF depuis ses octets en mémoire ou depuis un fichier temporaire"""
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source)
+
+
+def _group_pages(profiles, max_bytes, max_tokens):
+    """Regroupe les pages en plages contiguës sous les limites d'octets et de tokens"""
+    groups = []
+    for profile in profiles:
+        group = groups[-1] if groups else None
+        if (
+            group
+            and group[-1]["page"] + 1 == profile["page"]
+            and sum(p["size"] for p in group) + profile["size"] <= max_bytes
+            and sum(p["tokens"] for p in group) + profile["tokens"] <= max_tokens
+        ):
+            group.append(profile)
+        else:
+            groups.append([profile])
+    return groups
+
+
+def _build_chunk(doc, pages):
+    """Construit le sous-document PDF d'une plage de pages contiguës"""
+    start, end = pages[0]["page"], pages[-1]["page"] + 1
+    with fitz.open() as sub_doc:
+        sub_doc.insert_pdf(doc, from_page=start, to_page=end - 1)
+        pdf_bytes = sub_doc.write()
+    return {
+        "start_page": start,
+        "end_page": end,
+        "pages": pages,
+        "size": len(pdf_bytes),
+        "data": base64.b64encode(pdf_bytes),
+    }
+
+
+def _build_chunks(source, page_groups):
+    """Construit les sous-documents de plusieurs plages (découpage d'un chunk)"""
+    with _open_pdf(source) as doc:
+        return [_build_chunk(doc, pages) for pages in page_groups]
+
+
+def _prepare_document(source, thresholds, limits):
+    """Ouvre le PDF une seule fois : lit les pages à couche texte et prépare
+    les sous-documents des autres pages pour le LLM
+
+    Args:
+        source: Octets du PDF ou chemin d'un fichier temporaire.
+        thresholds (tuple): Seuils du classifieur de pages.
+        limits (tuple): (nombre maximal de pages ou None, octets et tokens
+            estimés maximaux par chunk).
+
+    Returns:
+        tuple: ({page: texte} lu localement, liste des chunks à envoyer au LLM)
+    """
+    max_pages, max_bytes, max_tokens = limits
+    texts_by_page = {}
+    profiles = []
+    with _open_pdf(source) as doc:
+        page_count = len(doc) if max_pages is None else min(len(doc), max_pages)
+        for i in range(page_count):
+            page = doc[i]
+            if _has_usable_text_layer(page, *thresholds):
+                texts_by_page[i] = page.get_text().strip()
+            else:
+                profiles.append(_page_profile(doc, i))
+
+        chunks = [
+            _build_chunk(doc, pages)
+            for pages in _group_pages(profiles, max_bytes, max_tokens)
+        ]
+    return texts_by_page, chunks
+
+
+async def _gather_or_cancel(*coros):
+    """Comme asyncio.gather, mais annule les tâches sœurs au premier échec
+
+    Aucune tâche ne survit à l'appel : le fichier temporaire du PDF peut être
+    supprimé sans qu'un chunk encore en cours ne le relise
+    """
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
 
 class PDFParser:
-    def __init__(self, model="claude-3-5-sonnet-latest"):
+    def __init__(
+        self,
+        model="claude-3-5-sonnet-latest",
+        process_workers=None,
+        max_calls_per_document=None,
+    ):
         """Initialise les paramètres et API Keys"""
-        load_dotenv()
         self.api_key = os.getenv("ANTHROPIC_API_KEY")
-        self.client = anthropic.AsyncAnthropic(api_key=self.api_key)
+        # Client partagé : le pool de connexions reste chaud d'un run à l'autre
+        self.client = clients.get_or_create(
+            ("anthropic", self.api_key),
+            lambda: anthropic.AsyncAnthropic(api_key=self.api_key),
+        )
 
         self.model = model
-        self.pages_per_chunk = 5
-        self.max_pages = 10  # Ajout de la limite de pages
-        self.max_size = 10 * 1024 * 1024  # 10MB
+        # Quota Anthropic partagé avec les autres runs du processus
+        self.rate_limiter = get_rate_limiter("anthropic", model)
+        self.max_pages = None  # Pas de limite : tout le document est traité
+        self.max_size = 10 * 1024 * 1024  # 10MB, limite de l'API par document
+        # Taille des chunks envoyés au LLM, adaptée au poids et à la densité des pages
+        self.max_chunk_bytes = 4 * 1024 * 1024  # 4MB
+        self.max_output_tokens = 4096
+        self.max_chunk_tokens = 3000  # Marge sous max_output_tokens
+        # Budget d'appels LLM par document (découpages compris)
+        if max_calls_per_document is None:
+            max_calls_per_document = int(os.getenv("PDF_MAX_CALLS_PER_DOCUMENT", 40))
+        self.max_calls_per_document = max_calls_per_document
+        self.max_download_size = 50 * 1024 * 1024  # 50MB
+        # Au-delà, le PDF téléchargé est écrit dans un fichier temporaire
+        self.max_memory_size = 20 * 1024 * 1024  # 20MB
         self.max_workers = 8
+        # Seuils du classifieur de pages (couche texte exploitable ou non)
+        self.min_text_chars = 200
+        self.max_image_coverage = 0.3
+        self.max_garbled_ratio = 0.05
+        self.last_stats = {"local_pages": 0, "llm_pages": 0, "llm_calls": 0}
         self.retry_delay = 10
         self.max_retries = 5
-        self.temp_pdf_dir = "temp_pdfs"
+        self._semaphore = asyncio.Semaphore(self.max_workers)
+        # Parsing PyMuPDF (CPU) hors de la boucle d'événements, partagé par process
+        self.process_workers = process_workers or int(
+            os.getenv("PDF_PROCESS_WORKERS", os.cpu_count() or 1)
+        )
+        self._pool = _get_process_pool(self.process_workers)
+        # Validateurs HTTP reçus, en attente de l'indexation complète du document
+        self._pending_validators = {}
 
-        # Création du dossier temporaire
-        os.makedirs(self.temp_pdf_dir, exist_ok=True)
+        # Cache des extractions LLM, adressé par le contenu des pages
+        cache_path = os.getenv("EXTRACTION_CACHE_PATH", ".cache/page_extraction.sqlite")
+        self.cache = clients.get_or_create(
+            ("extraction_cache", cache_path), lambda: ExtractionCache(cache_path)
+        )
+
+    def take_validators(self, url):
+        """Retire et renvoie les validateurs reçus au téléchargement d'une URL
+
+        L'appelant les enregistre (make_validator_store) une fois le document
+        extrait en entier et indexé sans échec.
+        """
+        return self._pending_validators.pop(url, None) or {}
+
+    async def download_pdf(self, url):
+        """Télécharge un PDF en streaming
+
+        Returns:
+            Les octets du PDF, le chemin d'un fichier temporaire s'il dépasse
+            max_memory_size, NOT_MODIFIED si le PDF est inchangé, ou None en
+            cas d'erreur.
+        """
+        data = bytearray()
+        spill = None
+        complete = False
+
+        # Requête conditionnelle : un fichier inchangé n'est pas retéléchargé
+        headers = {}
+        known = await asyncio.to_thread(make_validator_store().get, url)
+        if known.get("etag"):
+            headers["If-None-Match"] = known["etag"]
+        if known.get("last_modified"):
+            headers["If-Modified-Since"] = known["last_modified"]
 
-    def download_pdf(self, url):
-        """Télécharge un PDF et le stocke temporairement"""
-        filename = os.path.join(self.temp_pdf_dir, os.path.basename(url))
         try:
-            response = requests.get(url, stream=True, verify=False)
-            if response.status_code == 200:
-                with open(filename, "wb") as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                return filename
-            else:
-                print(
-                    f"⚠️ Impossible de télécharger {url} (Code: {response.status_code})"
-                )
-        except requests.RequestException as e:
+            async with _get_http_session().get(url, headers=headers) as response:
+                if response.status == 304:
+                    print(f"⏭️ {url} inchangé depuis la dernière indexation, ignoré.")
+                    return NOT_MODIFIED
+                if response.status != 200:
+                    print(
+                        f"⚠️ Impossible de télécharger {url} (Code: {response.status})"
+                    )
+                    return None
+
+                if (response.content_length or 0) > self.max_download_size:
+                    print(
+                        f"⚠️ {url} trop volumineux ({response.content_length} octets), ignoré."
+                    )
+                    return None
+
+                size = 0
+                async for chunk in response.content.iter_chunked(65536):
+                    size += len(chunk)
+                    if size > self.max_download_size:
+                        print(
+                            f"⚠️ {url} dépasse {self.max_download_size} octets, abandon."
+                        )
+                        return None
+                    if spill is not None:
+                        spill.write(chunk)
+                        continue
+                    data.extend(chunk)
+                    if size > self.max_memory_size:
+                        # Nom unique : pas de collision entre runs concurrents
+                        spill = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+                        spill.write(data)
+                        data = bytearray()
+
+                self._pending_validators[url] = {
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                }
+                complete = True
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             print(f"❌ Erreur téléchargement {url}: {e}")
-        return None
+            return None
+        finally:
+            if spill is not None:
+                spill.close()
+                if not complete:
+                    os.remove(spill.name)
+
+        return spill.name if spill is not None else bytes(data)
 
-    async def extract_text_from_pdf(self, pdf_path):
-        """Extrait et fusionne le texte d'un PDF via Claude 3.5 en chunks (max 10 pages)"""
-        doc = fitz.open(pdf_path)
-        total_pages = min(len(doc), self.max_pages)  # Limite à 10 pages
-        doc.close()
+    async def extract_text_from_pdf(self, pdf):
+        """Extrait et fusionne le texte d'un PDF via Claude 3.5 en chunks adaptatifs
 
-        extracted_texts = []
-        for i in range(0, total_pages, self.pages_per_chunk):
-            end_page = min(i + self.pages_per_chunk, total_pages)
-            result = await self._process_pdf_chunk(pdf_path, i, end_page)
-            if result:
-                extracted_texts.append(result["text"])
+        Args:
+            pdf: Octets du PDF, ou chemin d'un fichier temporaire supprimé après traitement.
 
-        os.remove(pdf_path)  # Suppression après traitement
-        return "\n\n".join(extracted_texts)  # Fusion du texte
+        Returns:
+            tuple: (texte fusionné, True si toutes les pages ont été extraites en
+            entier). Un texte partiel (page trop grande, échec d'un chunk, budget
+            d'appels épuisé) reste indexable, mais ses validateurs ne doivent pas
+            être enregistrés pour que les pages manquantes soient réessayées.
+        """
+        try:
+            # Les pages avec une bonne couche texte sont lues localement par fitz
+            texts_by_page, chunks = await self._run_in_pool(
+                _prepare_document,
+                pdf,
+                (self.min_text_chars, self.max_image_coverage, self.max_garbled_ratio),
+                (self.max_pages, self.max_chunk_bytes, self.max_chunk_tokens),
+            )
+            llm_pages = sum(chunk["end_page"] - chunk["start_page"] for chunk in chunks)
+            print(
+                f"📄 {len(texts_by_page)} page(s) extraite(s) localement, "
+                f"{llm_pages} envoyée(s) au LLM en {len(chunks)} chunk(s)"
+            )
 
-    async def _process_pdf_chunk(self, pdf_path, start_page, end_page):
-        """Découpe un PDF en chunks et envoie à Claude 3.5"""
-        doc = fitz.open(pdf_path)
-        sub_doc = fitz.open()
+            # Seules les pages scannées ou mal encodées partent au LLM, par plages
+            # contiguës dimensionnées selon leur poids et leur densité, en parallèle
+            budget = {"calls": self.max_calls_per_document}
+            results = await _gather_or_cancel(
+                *(self._process_pdf_chunk(pdf, chunk, budget) for chunk in chunks)
+            )
+        finally:
+            if isinstance(pdf, str):
+                os.remove(pdf)  # Suppression après traitement
 
-        for j in range(start_page, end_page):
-            sub_doc.insert_pdf(doc, from_page=j, to_page=j)
+        self.last_stats = {
+            "local_pages": len(texts_by_page),
+            "llm_pages": llm_pages,
+            "llm_calls": self.max_calls_per_document - budget["calls"],
+        }
+        for pieces, _ in results:
+            for start_page, text in pieces:
+                texts_by_page[start_page] = text
+        complete = all(chunk_complete for _, chunk_complete in results)
 
-        pdf_bytes = sub_doc.write()
-        pdf_base64 = base64.b64encode(pdf_bytes).decode("utf-8")
+        # Réassemblage dans l'ordre des pages
+        extracted_texts = [
+            texts_by_page[i] for i in sorted(texts_by_page) if texts_by_page[i]
+        ]
+        return "\n\n".join(extracted_texts), complete  # Fusion du texte
 
-        if len(pdf_bytes) > self.max_size:
-            print(f"⚠️ Chunk {start_page + 1}-{end_page} trop grand, ignoré.")
-            return None
+    async def _run_in_pool(self, func, *args):
+        """Exécute `func` dans le pool de processus sans bloquer la boucle"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, func, *args)
+
+    async def _split_chunk(self, pdf, chunk, budget, cache_key):
+        """Coupe un chunk en deux moitiés et les traite séparément
+
+        Si toutes les pages ont été extraites, le texte réuni est aussi mis en
+        cache sous la clé du chunk d'origine : une réindexation du même PDF
+        trouve alors le chunk en cache sans rappeler le LLM pour le découper.
+        """
+        pages = chunk["pages"]
+        middle = len(pages) // 2
+        halves = await self._run_in_pool(
+            _build_chunks, pdf, [pages[:middle], pages[middle:]]
+        )
+        results = await _gather_or_cancel(
+            *(self._process_pdf_chunk(pdf, half, budget) for half in halves)
+        )
+        pieces = [piece for half_pieces, _ in results for piece in half_pieces]
+        complete = all(half_complete for _, half_complete in results)
+        if complete:
+            self.cache.put_text(
+                cache_key, "\n\n".join(text for _, text in pieces if text)
+            )
+        return pieces, complete
+
+    async def _process_pdf_chunk(self, pdf, chunk, budget):
+        """Envoie un chunk de pages à Claude 3.5, en le découpant si besoin
+
+        Returns:
+            tuple: Couples (première page, texte) des plages extraites, et si
+            toutes les pages du chunk ont été extraites en entier.
+        """
+        start_page, end_page = chunk["start_page"], chunk["end_page"]
+        cache_key = make_cache_key(
+            [page["digest"] for page in chunk["pages"]], self.model, EXTRACTION_PROMPT
+        )
+        cached_text = self.cache.get_text(cache_key)
+        if cached_text is not None:
+            return [(start_page, cached_text)], True
+
+        if chunk["size"] > self.max_size:
+            if len(chunk["pages"]) > 1:
+                return await self._split_chunk(pdf, chunk, budget, cache_key)
+            print(f"⚠️ Page {start_page + 1} trop grande, ignorée.")
+            return [], False
+
+        if budget["calls"] <= 0:
+            print(
+                f"⚠️ Budget de {self.max_calls_per_document} appels atteint, "
+                f"pages {start_page + 1}-{end_page} non extraites."
+            )
+            return [], False
+        budget["calls"] -= 1
+
+        response = await self._extract_chunk(chunk)
+        if response is None:
+            return [], False
+        extracted_text, stop_reason = response
+
+        if stop_reason == "max_tokens":
+            if len(chunk["pages"]) > 1:
+                print(
+                    f"✂️ Sortie tronquée pages {start_page + 1}-{end_page}, découpage."
+                )
+                return await self._split_chunk(pdf, chunk, budget, cache_key)
+            # Une seule page : le texte partiel est gardé mais pas mis en cache
+            print(f"⚠️ Sortie tronquée page {start_page + 1}, texte partiel conservé.")
+            return [(start_page, extracted_text)], False
+
+        self.cache.put_text(cache_key, extracted_text)
+        return [(start_page, extracted_text)], True
+
+    async def _extract_chunk(self, chunk):
+        """Appelle Claude 3.5 sur un chunk avec réessais
+
+        Returns:
+            tuple: (texte extrait, stop_reason), ou None en cas d'erreur.
+        """
+        start_page, end_page = chunk["start_page"], chunk["end_page"]
+        pdf_base64 = chunk["data"].decode("ascii")
+        estimated_tokens = sum(
+            _PDF_PAGE_INPUT_TOKENS + page["tokens"] for page in chunk["pages"]
+        )
 
         for attempt in range(1, self.max_retries + 1):
             try:
-                response = await self.client.messages.create(
-                    model=self.model,
-                    max_tokens=2048,
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "document",
-                                    "source": {
-                                        "type": "base64",
-                                        "media_type": "application/pdf",
-                                        "data": pdf_base64,
+                async with self._semaphore:
+                    # L'indexation passe après le trafic interactif
+                    await self.rate_limiter.acquire(estimated_tokens, BACKGROUND)
+                    raw_response = await self.client.messages.with_raw_response.create(
+                        model=self.model,
+                        max_tokens=self.max_output_tokens,
+                        messages=[
+                            {
+                                "role": "user",
+                                "content": [
+                                    {
+                                        "type": "document",
+                                        "source": {
+                                            "type": "base64",
+                                            "media_type": "application/pdf",
+                                            "data": pdf_base64,
+                                        },
+                                    },
+                                    {
+                                        "type": "text",
+                                        "text": EXTRACTION_PROMPT,
                                     },
-                                },
-                                {
-                                    "type": "text",
-                                    "text": "Extract only the raw text from this PDF section in French, with no additional comments."
-                                }
-                            ]
-                        }
-                    ],
+                                ],
+                            }
+                        ],
+                    )
+                self.rate_limiter.update_from_headers(raw_response.headers)
+                response = raw_response.parse()
+                self.rate_limiter.settle(
+                    estimated_tokens,
+                    response.usage.input_tokens + response.usage.output_tokens,
                 )
 
                 if isinstance(response.content, list):
@@ -116,30 +538,59 @@ class PDFParser:
                         if hasattr(response.content, "text")
                         else response.content
                     )
-
-                return {
-                    "start_page": start_page + 1,
-                    "end_page": end_page,
-                    "text": extracted_text,
-                }
+                return extracted_text, response.stop_reason
 
             except anthropic.APIStatusError as e:
-                if "429" in str(e):
-                    wait_time = self.retry_delay * attempt
+                if e.status_code == 429:
+                    wait_time = self._backoff_delay(e, attempt)
                     print(
-                        f"⏳ Rate limit dépassé (tentative {attempt}). Pause de {wait_time}s..."
+                        f"⏳ Rate limit dépassé (tentative {attempt}). Pause de {wait_time:.1f}s..."
                     )
-                    time.sleep(wait_time)
+                    # Tous les appels à ce modèle patientent ensemble, puis
+                    # repartent au rythme du limiteur (pas de rafale de réessais)
+                    self.rate_limiter.update_from_headers(e.response.headers)
+                    self.rate_limiter.pause(wait_time)
                 else:
                     print(f"❌ Erreur pages {start_page + 1}-{end_page}: {str(e)}")
                     return None
+            except anthropic.APIConnectionError as e:
+                # Coupure réseau ou délai dépassé (APITimeoutError) : seul cet
+                # appel patiente, le quota partagé n'est pas en cause
+                wait_time = self._backoff_delay(e, attempt)
+                print(
+                    f"🔌 Erreur de connexion pages {start_page + 1}-{end_page} "
+                    f"(tentative {attempt}): {str(e)}. Pause de {wait_time:.1f}s..."
+                )
+                await asyncio.sleep(wait_time)
 
         return None
 
+    def _backoff_delay(self, error, attempt):
+        """Calcule l'attente avant réessai (retry-after sinon exponentiel + jitter)"""
+        response = getattr(error, "response", None)
+        retry_after = (
+            response.headers.get("retry-after") if response is not None else None
+        )
+        if retry_after:
+            try:
+                return float(retry_after) + random.uniform(0, 1)
+            except ValueError:
+                pass
+        base = self.retry_delay * 2 ** (attempt - 1)
+        return random.uniform(base / 2, base)
+
     async def process_pdf(self, pdf_url):
-        """Pipeline complet pour traiter un seul PDF et retourner le texte fusionné"""
-        pdf_path = self.download_pdf(pdf_url)
-        if pdf_path:
-            return await self.extract_text_from_pdf(pdf_path)
+        """Pipeline complet pour traiter un seul PDF
+
+        Les validateurs HTTP ne sont pas enregistrés ici : l'appelant les récupère
+        avec take_validators et les enregistre une fois le document indexé.
+
+        Returns:
+            tuple: (texte fusionné ou None, extraction complète), comme
+            extract_text_from_pdf.
+        """
+        pdf = await self.download_pdf(pdf_url)
+        if pdf:
+            return await self.extract_text_from_pdf(pdf)
         else:
-            return None
+            return None, False
@@ -2,6 +2,7 @@
 
 from dataclasses import dataclass, field
 
+
 # The index state defines the simple IO for the single-node index graph
 @dataclass(kw_only=True)
 class InputState:
@@ -11,12 +12,14 @@ class InputState:
     the documents to be indexed and the retriever used for searching
     these documents.
     """
+
     title: str
     publication_year: str
     publisher: str
     url: str
     project_code: str
 
+
 @dataclass(kw_only=True)
 class IndexState(InputState):
     """Represents the state for document indexing and retrieval.
@@ -25,5 +28,12 @@ class IndexState(InputState):
     the documents to be indexed and the retriever used for searching
     these documents.
     """
+
     pdf_text: str = field(default_factory=str)
-    metadata: dict = field(default_factory=dict)
\ No newline at end of file
+    metadata: dict = field(default_factory=dict)
+    extraction_complete: bool = False
+    """Whether every page of the PDF was extracted in full."""
+    validators: dict = field(default_factory=dict)
+    """ETag/Last-Modified of the download, saved only once the document is fully indexed."""
+    extraction_stats: dict = field(default_factory=dict)
+    """Number of pages extracted locally vs. sent to the LLM."""
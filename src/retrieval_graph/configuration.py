@@ -2,7 +2,8 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Literal, Optional
 
 from shared.configuration import BaseConfiguration
 
@@ -18,4 +19,136 @@ class RetreiveConfiguration(BaseConfiguration):
     This class defines the parameters needed for configuring the indexing and
     retrieval processes, including embedding model selection, retriever provider choice, and search parameters.
     """
-    retreive_model: str = "gpt-4o"
\ No newline at end of file
+
+    retreive_model: str = "gpt-4o"
+
+    retrieval_timeout: float = field(
+        default=5.0,
+        metadata={
+            "description": "Deadline in seconds for the vector query; past it the turn falls back to a cached or empty result."
+        },
+    )
+
+    hedge_percentile: Optional[float] = field(
+        default=0.95,
+        metadata={
+            "description": "Latency percentile (0-1) after which a duplicate vector query is sent. None disables hedging."
+        },
+    )
+
+    semantic_cache_threshold: Optional[float] = field(
+        default=0.95,
+        metadata={
+            "description": "Cosine similarity above which a previous query's documents are reused. None disables the semantic cache."
+        },
+    )
+
+    semantic_cache_ttl: float = field(
+        default=3600.0,
+        metadata={
+            "description": "Seconds during which a cached retrieval result can be reused."
+        },
+    )
+
+    semantic_cache_size: int = field(
+        default=1000,
+        metadata={
+            "description": "Maximum number of queries kept in the semantic cache."
+        },
+    )
+
+    query_token_budget: int = field(
+        default=256,
+        metadata={
+            "description": "Maximum number of tokens in the retrieval query built from the conversation."
+        },
+    )
+
+    context_token_budget: int = field(
+        default=3000,
+        metadata={
+            "description": "Maximum number of tokens of retrieved text passed to the generation prompt."
+        },
+    )
+
+    mmr_lambda: float = field(
+        default=0.7,
+        metadata={
+            "description": "Relevance/diversity trade-off used to order retrieved chunks (1 = relevance only)."
+        },
+    )
+
+    hybrid_search: bool = field(
+        default=True,
+        metadata={
+            "description": "Fuse BM25 results from the local lexical index with vector results."
+        },
+    )
+
+    lexical_k: int = field(
+        default=10,
+        metadata={
+            "description": "Number of BM25 results fused with the vector results."
+        },
+    )
+
+    history_token_budget: int = field(
+        default=2000,
+        metadata={
+            "description": "Maximum number of tokens of conversation history sent verbatim to the generation model."
+        },
+    )
+
+    history_max_turns: int = field(
+        default=4,
+        metadata={
+            "description": "Maximum number of recent turns sent verbatim; older turns are folded into a rolling summary."
+        },
+    )
+
+    history_summary_model: str = field(
+        default="gpt-4o-mini",
+        metadata={
+            "description": "Chat model used to update the rolling summary of older turns."
+        },
+    )
+
+    history_summary_tokens: int = field(
+        default=300,
+        metadata={"description": "Maximum length in tokens of the rolling summary."},
+    )
+
+    routing: bool = field(
+        default=True,
+        metadata={
+            "description": "Route small talk to a direct reply and short follow-ups to the previous documents, skipping retrieval."
+        },
+    )
+
+    response_cache_backend: Optional[Literal["memory", "sqlite"]] = field(
+        default="memory",
+        metadata={
+            "description": "Where generated answers are cached for exact repeats. None disables the response cache."
+        },
+    )
+
+    response_cache_ttl: float = field(
+        default=86400.0,
+        metadata={
+            "description": "Seconds during which a cached answer can be served again."
+        },
+    )
+
+    response_cache_size: int = field(
+        default=1000,
+        metadata={
+            "description": "Maximum number of answers kept by the in-memory response cache."
+        },
+    )
+
+    response_cache_tail: int = field(
+        default=3,
+        metadata={
+            "description": "Number of trailing conversation messages part of the response cache key."
+        },
+    )
@@ -0,0 +1,131 @@
+"""Pack retrieved documents into a token-budgeted context for generation.
+
+Retrieved chunks often overlap: the splitter repeats 200 characters between
+neighbouring chunks, and the same passage can be hit several times. Passing them
+all to the model spends prompt tokens on duplicated text. The packer orders the
+chunks by maximal marginal relevance (relevance to the query, penalised by
+similarity to what is already selected), keeps as many as fit in the token
+budget, then stitches together overlapping chunks of the same document.
+"""
+
+from typing import Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from shared.utils import count_tokens
+
+# Shortest shared prefix/suffix treated as a splitter overlap rather than chance
+_MIN_OVERLAP_CHARS = 20
+
+
+def mmr_order(
+    query_vector: list[float], doc_vectors: list[list[float]], lambda_mult: float
+) -> list[int]:
+    """Rank documents by maximal marginal relevance.
+
+    Args:
+        query_vector (list[float]): Embedding of the search query.
+        doc_vectors (list[list[float]]): Embeddings of the retrieved documents.
+        lambda_mult (float): 1 favours pure relevance, 0 pure diversity.
+
+    Returns:
+        list[int]: Indices of the documents, most useful first.
+    """
+    if not doc_vectors:
+        return []
+    docs = np.asarray(doc_vectors, dtype=np.float32)
+    docs /= np.linalg.norm(docs, axis=1, keepdims=True) + 1e-12
+    query = np.asarray(query_vector, dtype=np.float32)
+    query /= np.linalg.norm(query) + 1e-12
+
+    relevance = docs @ query
+    similarity = docs @ docs.T
+    selected: list[int] = []
+    remaining = list(range(len(doc_vectors)))
+    while remaining:
+        if selected:
+            redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+        else:
+            redundancy = np.zeros(len(remaining))
+        scores = lambda_mult * relevance[remaining] - (1 - lambda_mult) * redundancy
+        best = remaining[int(np.argmax(scores))]
+        selected.append(best)
+        remaining.remove(best)
+    return selected
+
+
+def _overlap(left: str, right: str) -> int:
+    """Return the length of the longest suffix of `left` that prefixes `right`."""
+    for size in range(min(len(left), len(right)), _MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def merge_overlapping(docs: list[Document]) -> list[Document]:
+    """Stitch together chunks of the same document whose text overlaps.
+
+    Documents keep the position of the first chunk of their `url`.
+    """
+    merged: list[Document] = []
+    for doc in docs:
+        url = doc.metadata.get("url")
+        for i, kept in enumerate(merged):
+            if url is None or kept.metadata.get("url") != url:
+                continue
+            if doc.page_content in kept.page_content:
+                break
+            if size := _overlap(kept.page_content, doc.page_content):
+                text = kept.page_content + doc.page_content[size:]
+            elif size := _overlap(doc.page_content, kept.page_content):
+                text = doc.page_content + kept.page_content[size:]
+            else:
+                continue
+            merged[i] = Document(page_content=text, metadata=kept.metadata)
+            break
+        else:
+            merged.append(doc)
+    return merged
+
+
+def pack_documents(
+    docs: list[Document],
+    *,
+    token_budget: int,
+    query_vector: Optional[list[float]] = None,
+    doc_vectors: Optional[list[list[float]]] = None,
+    lambda_mult: float = 0.7,
+) -> list[Document]:
+    """Select and merge retrieved documents so that they fit in `token_budget`.
+
+    Args:
+        docs (list[Document]): Retrieved documents, in retriever order.
+        token_budget (int): Maximum number of tokens of document text.
+        query_vector (Optional[list[float]]): Query embedding; enables MMR ordering with `doc_vectors`.
+        doc_vectors (Optional[list[list[float]]]): Embeddings of `docs`.
+        lambda_mult (float): MMR trade-off between relevance and diversity.
+
+    Returns:
+        list[Document]: The packed documents.
+    """
+    unique: dict[str, int] = {}
+    for i, doc in enumerate(docs):
+        unique.setdefault(doc.page_content, i)
+    indices = list(unique.values())
+
+    if query_vector is not None and doc_vectors is not None:
+        ranking = mmr_order(
+            query_vector, [doc_vectors[i] for i in indices], lambda_mult
+        )
+        indices = [indices[i] for i in ranking]
+
+    selected: list[Document] = []
+    used = 0
+    for i in indices:
+        tokens = count_tokens(docs[i].page_content)
+        if used + tokens > token_budget:
+            continue
+        selected.append(docs[i])
+        used += tokens
+    return merge_overlapping(selected)
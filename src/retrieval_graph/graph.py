@@ -1,15 +1,181 @@
 ### Nodes
 
-from langchain_core.messages import HumanMessage
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, SystemMessage, message_chunk_to_message
+from langchain_core.runnables import RunnableConfig
+from langchain_core.vectorstores import VectorStoreRetriever
+from langchain_openai import ChatOpenAI
 from langgraph.graph import END, START, StateGraph
 
 from retrieval_graph.configuration import RetreiveConfiguration
+from retrieval_graph.context import pack_documents
+from retrieval_graph.history import update_summary, window_start
+from retrieval_graph.query import build_query
+from retrieval_graph.router import ROUTE_COUNTS, classify, direct_reply, latest_question
 from retrieval_graph.state import GraphState, InputState
-from shared.retrieval import make_pinecone_retriever
+from shared import clients
+from shared.lexical import (
+    content_key,
+    make_lexical_index,
+    reciprocal_rank_fusion,
+    tokenize,
+)
+from shared.rate_limit import get_rate_limiter
+from shared.response_cache import make_response_cache, make_response_key
+from shared.retrieval import afetch_vectors, asearch_with_vectors, make_retriever
+from shared.semantic_cache import SemanticCache
+from shared.utils import (
+    LatencyTracker,
+    count_tokens,
+    format_context,
+    hedged_call,
+    number_sources,
+)
+
+# Latencies of recent vector queries, used to decide when to hedge
+_retrieval_latencies = LatencyTracker()
+# Search hits (with their vectors) of a question: documents in rank order, paired
+# with their stored vector or None when the store could not return it
+SearchHits = list[tuple[Document, Optional[list[float]]]]
+# Last results retrieved per question, served when the deadline is exceeded
+_recent_results: OrderedDict[str, tuple[list[float], SearchHits]] = OrderedDict()
+_MAX_RECENT_RESULTS = 256
+# Part of every response cache key: bump it whenever the generation prompt changes
+GENERATE_PROMPT_VERSION = "2"
+# Tokens reserved for the system prompt and the answer when budgeting a generation
+_GENERATION_TOKEN_ALLOWANCE = 2048
+
+
+async def _search(
+    retriever: VectorStoreRetriever,
+    question: str,
+    search_filter: dict,
+    configuration: RetreiveConfiguration,
+    hedge_after: Optional[float],
+) -> tuple[list[float], SearchHits]:
+    """Embed the question and search the stores, through the semantic cache.
+
+    Returns the query vector and the hits with their stored vectors, which
+    `pack_context` uses for MMR without embedding the chunks again.
+    """
+    query_vector = await retriever.vectorstore.embeddings.aembed_query(question)
+    # Cached results are only reused under the same filter
+    filter_key = json.dumps(search_filter, sort_keys=True)
+
+    semantic_cache = None
+    if configuration.semantic_cache_threshold is not None:
+        # Vectors are only comparable within one embedding model
+        semantic_cache = clients.get_or_create(
+            ("semantic_cache", configuration.embedding_model),
+            lambda: SemanticCache(
+                max_entries=configuration.semantic_cache_size,
+                ttl=configuration.semantic_cache_ttl,
+            ),
+        )
+        cached = semantic_cache.lookup(
+            query_vector, configuration.semantic_cache_threshold, filter_key
+        )
+        print(f"---SEMANTIC CACHE {semantic_cache.stats()}---")
+        if cached is not None:
+            return query_vector, cached
+
+    k = retriever.search_kwargs.get("k", 10)
+
+    async def vector_search() -> SearchHits:
+        started = time.monotonic()
+        hits = await hedged_call(
+            lambda: asearch_with_vectors(
+                retriever.vectorstore,
+                query_vector,
+                k=k,
+                filter=search_filter,
+                score_threshold=retriever.search_kwargs.get("score_threshold"),
+            ),
+            hedge_after,
+        )
+        _retrieval_latencies.record(time.monotonic() - started)
+        return hits
+
+    if configuration.hybrid_search:
+        # BM25 catches exact terms (varieties, products, project codes) that
+        # embeddings blur; both rankings are fused by reciprocal rank
+        vector_hits, lexical_docs = await asyncio.gather(
+            vector_search(),
+            asyncio.to_thread(
+                make_lexical_index().search,
+                question,
+                configuration.lexical_k,
+                search_filter,
+            ),
+        )
+        documents = reciprocal_rank_fusion(
+            [[doc for doc, _ in vector_hits], lexical_docs], limit=k
+        )
+        vectors = {content_key(doc): vector for doc, vector in vector_hits}
+        # Lexical-only hits: their vectors are fetched from the store by id
+        fetched = await afetch_vectors(
+            retriever.vectorstore,
+            [doc.id for doc in documents if doc.id and content_key(doc) not in vectors],
+        )
+        hits = [
+            (doc, vectors.get(content_key(doc)) or fetched.get(doc.id))
+            for doc in documents
+        ]
+    else:
+        hits = await vector_search()
+
+    if semantic_cache is not None:
+        semantic_cache.add(query_vector, hits, filter_key)
+    return query_vector, hits
+
+
+async def route(state: GraphState, config: RunnableConfig):
+    """Classify the turn before any retrieval
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        state (dict): Route of the turn ("retrieve", "reuse" or "reply")
+    """
+    configuration = RetreiveConfiguration.from_runnable_config(config)
+    if not configuration.routing:
+        return {"route": "retrieve"}
+    # Terms the documents in the state already cover
+    known_terms = set(tokenize(state.query))
+    for doc in state.documents:
+        known_terms.update(tokenize(doc.page_content))
+    turn_route = classify(
+        latest_question(state.messages), bool(state.documents), known_terms
+    )
+    ROUTE_COUNTS[turn_route] += 1
+    print(f"---ROUTE {turn_route.upper()} {dict(ROUTE_COUNTS)}---")
+    return {"route": turn_route}
+
+
+def reply(state: GraphState):
+    """Answer small talk directly, without retrieval or LLM call
+
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        state (dict): The canned answer appended to the messages
+    """
+    print("---REPLY---")
+    answer = direct_reply(latest_question(state.messages))
+    return {"messages": [AIMessage(content=answer)]}
 
 
-def retrieve(state: GraphState) -> dict[str, list[str] | str]: 
+async def retrieve(
+    state: GraphState, config: RunnableConfig
+) -> dict[str, list[str] | str]:
     """Retrieve documents
 
     Args:
@@ -19,16 +185,107 @@ def retrieve(state: GraphState) -> dict[str, list[str] | str]:
         state (dict): New key added to state, documents, that contains retrieved documents
     """
     print("---RETRIEVE---")
-    # Extract human messages and concatenate them
-    question = " ".join(msg.content for msg in state.messages if isinstance(msg, HumanMessage))
+    configuration = RetreiveConfiguration.from_runnable_config(config)
+    # Bounded query weighted towards the latest human turns
+    question = build_query(state.messages, configuration.query_token_budget)
 
     # Retrieval
-    with make_pinecone_retriever(OpenAIEmbeddings(model="text-embedding-3-small")) as retriever:
-        documents = retriever.invoke(question)
-        return {"documents": documents, "message": state.messages}
+    hedge_after = (
+        _retrieval_latencies.percentile(configuration.hedge_percentile)
+        if configuration.hedge_percentile is not None
+        else None
+    )
+    with make_retriever(config) as retriever:
+        # Filters from the graph input refine those of the configuration
+        search_filter = {**retriever.search_kwargs.get("filter", {}), **state.filters}
+        recent_key = f"{question}\0{json.dumps(search_filter, sort_keys=True)}"
+        try:
+            query_vector, hits = await asyncio.wait_for(
+                _search(retriever, question, search_filter, configuration, hedge_after),
+                timeout=configuration.retrieval_timeout,
+            )
+        except asyncio.TimeoutError:
+            print(f"---RETRIEVE TIMEOUT ({configuration.retrieval_timeout}s)---")
+            query_vector, hits = _recent_results.get(recent_key, ([], []))
+        else:
+            _recent_results[recent_key] = (query_vector, hits)
+            _recent_results.move_to_end(recent_key)
+            if len(_recent_results) > _MAX_RECENT_RESULTS:
+                _recent_results.popitem(last=False)
+        # MMR needs the vector of every hit; otherwise the retriever order is kept
+        vectors = [vector for _, vector in hits]
+        return {
+            "documents": [doc for doc, _ in hits],
+            "query_vector": query_vector,
+            "document_vectors": vectors if all(vectors) else [],
+            "query": question,
+            "message": state.messages,
+        }
+
+
+async def pack_context(state: GraphState, config: RunnableConfig):
+    """Pack retrieved documents into the context token budget
 
+    Args:
+        state (dict): The current graph state
+
+    Returns:
+        state (dict): Documents replaced by the deduplicated, merged selection
+    """
+    print("---PACK CONTEXT---")
+    if not state.documents:
+        return {}
+
+    configuration = RetreiveConfiguration.from_runnable_config(config)
+    # Vectors returned by the store with the hits, aligned with the documents
+    query_vector = state.query_vector or None
+    doc_vectors = state.document_vectors or None
+    if query_vector is None or doc_vectors is None:
+        print("---PACK CONTEXT: NO STORED VECTORS, MMR SKIPPED---")
+    documents = pack_documents(
+        state.documents,
+        token_budget=configuration.context_token_budget,
+        query_vector=query_vector,
+        doc_vectors=doc_vectors,
+        lambda_mult=configuration.mmr_lambda,
+    )
+    # The vectors are only needed here: keep them out of the checkpoints
+    return {"documents": documents, "query_vector": [], "document_vectors": []}
+
+
+async def window_history(state: GraphState, config: RunnableConfig):
+    """Fold turns that leave the verbatim history window into the rolling summary
+
+    Runs after generate, so the summary call is never on the answer's critical
+    path; the next turn sends the summary and the remaining recent turns.
+
+    Args:
+        state (dict): The current graph state
 
-async def generate(state: GraphState):
+    Returns:
+        state (dict): Updated summary and number of messages it covers
+    """
+    configuration = RetreiveConfiguration.from_runnable_config(config)
+    start = window_start(
+        state.messages,
+        configuration.history_token_budget,
+        configuration.history_max_turns,
+    )
+    if start <= state.summarized_messages:
+        return {}
+
+    print(f"---SUMMARIZE {start - state.summarized_messages} MESSAGE(S)---")
+    # Only the messages that just left the window are summarised
+    summary = await update_summary(
+        state.summary,
+        state.messages[state.summarized_messages : start],
+        model=configuration.history_summary_model,
+        max_tokens=configuration.history_summary_tokens,
+    )
+    return {"summary": summary, "summarized_messages": start}
+
+
+async def generate(state: GraphState, config: RunnableConfig):
     """
     Generate answer
 
@@ -39,14 +296,27 @@ async def generate(state: GraphState):
         state (dict): New key added to state, generation, that contains LLM generation
     """
     print("---GENERATE---")
-    messages = state.messages
+    # Recent turns verbatim, older ones through the rolling summary
+    messages = state.messages[state.summarized_messages :]
+    if state.summary:
+        messages = [
+            SystemMessage(content=f"Résumé des échanges précédents :\n{state.summary}"),
+            *messages,
+        ]
     documents = state.documents
+    # One numbered table of sources, then chunks tagged only with [n]
+    context = format_context(documents)
+    sources, _ = number_sources(documents)
 
     # RAG generation
     # Prompt
     from langchain_core.prompts import ChatPromptTemplate
 
-    prompt = ChatPromptTemplate([("system", """
+    prompt = ChatPromptTemplate(
+        [
+            (
+                "system",
+                """
 
     Vous êtes un expert en conseil agricole spécialisé dans l'analyse des données RD-Agri.
 
@@ -107,28 +377,124 @@ async def generate(state: GraphState):
     Contexte : 
 
     {context}
-    """)])
-    
+    """,
+            )
+        ]
+    )
+
+    # Exact repeats (same conversation tail, same chunks) are served from cache
+    configuration = RetreiveConfiguration.from_runnable_config(config)
+    response_cache = None
+    if configuration.response_cache_backend is not None:
+        response_cache = make_response_cache(
+            configuration.response_cache_backend,
+            max_entries=configuration.response_cache_size,
+            ttl=configuration.response_cache_ttl,
+        )
+        cache_key = make_response_key(
+            messages[-configuration.response_cache_tail :],
+            documents,
+            configuration.retreive_model,
+            GENERATE_PROMPT_VERSION,
+        )
+        cached_answer = response_cache.get(cache_key)
+        if cached_answer is not None:
+            print("---GENERATE CACHE HIT---")
+            return {
+                "messages": [AIMessage(content=cached_answer)],
+                "documents": documents,
+                "sources": sources,
+                "generation_stats": {"cache_hit": True},
+            }
+
     # LLM
-    llm = ChatOpenAI(model_name="gpt-4o", temperature=0)
-    
+    llm = clients.get_or_create(
+        ("chat_openai", configuration.retreive_model, 0),
+        lambda: ChatOpenAI(
+            model_name=configuration.retreive_model,
+            temperature=0,
+            stream_usage=True,
+            include_response_headers=True,
+        ),
+    )
+    # Interactive traffic: served ahead of indexing calls on the shared quota
+    rate_limiter = get_rate_limiter("openai", configuration.retreive_model)
+    estimated_tokens = (
+        _GENERATION_TOKEN_ALLOWANCE
+        + sum(count_tokens(str(message.content)) for message in messages)
+        + count_tokens(context)
+    )
+    await rate_limiter.acquire(estimated_tokens)
 
     # Chain
     rag_chain = prompt + messages | llm
-    response = await rag_chain.ainvoke({"context" : documents})
-    return {"messages": [response], "documents": documents}
+
+    # Tokens are streamed so that LangGraph's "messages" stream mode renders
+    # the answer as it arrives; the full message is rebuilt for the state.
+    started = time.monotonic()
+    first_token_at = None
+    chunks = 0
+    response = None
+    async for chunk in rag_chain.astream({"context": context}, config):
+        if first_token_at is None and chunk.content:
+            first_token_at = time.monotonic()
+        chunks += 1
+        response = chunk if response is None else response + chunk
+    finished = time.monotonic()
+
+    rate_limiter.update_from_headers(response.response_metadata.get("headers") or {})
+    usage = response.usage_metadata or {}
+    if usage:
+        rate_limiter.settle(
+            estimated_tokens, usage.get("total_tokens", estimated_tokens)
+        )
+    output_tokens = usage.get("output_tokens", chunks)
+    first_token_at = first_token_at or finished
+    generation_stats = {
+        "cache_hit": False,
+        "time_to_first_token": first_token_at - started,
+        "total_time": finished - started,
+        "output_tokens": output_tokens,
+        "tokens_per_second": output_tokens / max(finished - first_token_at, 1e-6),
+    }
+    print(
+        f"---GENERATE TTFT {generation_stats['time_to_first_token']:.2f}s, "
+        f"{generation_stats['tokens_per_second']:.1f} tokens/s---"
+    )
+    message = message_chunk_to_message(response)
+    if response_cache is not None and isinstance(message.content, str):
+        response_cache.put(cache_key, message.content)
+    return {
+        "messages": [message],
+        "documents": documents,
+        "sources": sources,
+        "generation_stats": generation_stats,
+    }
 
 
 workflow = StateGraph(GraphState, input_schema=InputState)
 
 # Define the nodes
+workflow.add_node("route", route)
+workflow.add_node("reply", reply)
 workflow.add_node("retrieve", retrieve)
+workflow.add_node("pack_context", pack_context)
+workflow.add_node("window_history", window_history)
 workflow.add_node("generate", generate)
 
 # Build graph
-workflow.add_edge(START, "retrieve")
-workflow.add_edge("retrieve", "generate")
-workflow.add_edge("generate", END)
+workflow.add_edge(START, "route")
+# Follow-ups reuse the documents of the previous turn; small talk skips RAG
+workflow.add_conditional_edges(
+    "route",
+    lambda state: state.route,
+    {"retrieve": "retrieve", "reuse": "generate", "reply": "reply"},
+)
+workflow.add_edge("reply", END)
+workflow.add_edge("retrieve", "pack_context")
+workflow.add_edge("pack_context", "generate")
+workflow.add_edge("generate", "window_history")
+workflow.add_edge("window_history", END)
 
 # Compile
 graph = workflow.compile()
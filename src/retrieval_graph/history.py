@@ -0,0 +1,108 @@
+"""Keep the conversation sent to the generation model within a token budget.
+
+Resending the whole history on every turn makes input tokens and latency grow
+with the length of the session. Only the last turns are kept verbatim, within a
+token budget; older turns are folded into a rolling summary. The summary lives in
+the graph state with the number of messages it covers, so each turn only
+summarises the messages that have just left the window instead of recomputing
+it from the start. The summary is updated after the answer has been generated,
+so it never delays the answer, and its tokens are kept out of the graph's
+message stream.
+"""
+
+from langchain_core.messages import AnyMessage, HumanMessage
+from langchain_openai import ChatOpenAI
+from langgraph.constants import TAG_NOSTREAM
+
+from shared import clients
+from shared.rate_limit import get_rate_limiter
+from shared.utils import count_tokens
+
+SUMMARY_PROMPT = """Tu résumes une conversation entre un conseiller agricole et un assistant.
+
+Résumé actuel :
+{summary}
+
+Nouveaux échanges à intégrer :
+{transcript}
+
+Réécris le résumé en intégrant ces échanges, en quelques phrases. Conserve les
+questions posées, les cultures, régions, projets et contraintes mentionnés, et
+les conclusions importantes des réponses. Réponds uniquement avec le résumé."""
+
+
+def window_start(messages: list[AnyMessage], token_budget: int, max_turns: int) -> int:
+    """Return the index of the first message kept verbatim.
+
+    A turn starts at a human message. The latest turn is always kept; earlier
+    turns are added, newest first, while they fit in `token_budget` and
+    `max_turns`.
+
+    Args:
+        messages (list[AnyMessage]): The conversation so far.
+        token_budget (int): Maximum number of tokens of verbatim history.
+        max_turns (int): Maximum number of verbatim turns.
+
+    Returns:
+        int: Index into `messages`; everything before it belongs in the summary.
+    """
+    start = len(messages)
+    used = 0
+    turns = 0
+    for i in range(len(messages) - 1, -1, -1):
+        used += count_tokens(str(messages[i].content))
+        if used > token_budget and start < len(messages):
+            break
+        if isinstance(messages[i], HumanMessage):
+            start = i
+            turns += 1
+            if turns >= max_turns:
+                break
+    # Without any human turn there is nothing to window
+    return start if start < len(messages) else 0
+
+
+def _transcript(messages: list[AnyMessage]) -> str:
+    """Render messages as a plain `Conseiller:` / `Assistant:` transcript."""
+    speakers = {"human": "Conseiller", "ai": "Assistant"}
+    return "\n".join(
+        f"{speakers.get(msg.type, msg.type)}: {msg.content}"
+        for msg in messages
+        if isinstance(msg.content, str) and msg.content
+    )
+
+
+async def update_summary(
+    summary: str, messages: list[AnyMessage], *, model: str, max_tokens: int
+) -> str:
+    """Fold `messages` into the rolling `summary`.
+
+    Args:
+        summary (str): Summary of the turns already folded, possibly empty.
+        messages (list[AnyMessage]): Messages that just left the verbatim window.
+        model (str): Chat model used to summarise.
+        max_tokens (int): Maximum length of the new summary.
+
+    Returns:
+        str: The updated summary.
+    """
+    transcript = _transcript(messages)
+    if not transcript:
+        return summary
+
+    llm = clients.get_or_create(
+        ("summary_chat_openai", model, max_tokens),
+        lambda: ChatOpenAI(model_name=model, temperature=0, max_tokens=max_tokens),
+    )
+    prompt = SUMMARY_PROMPT.format(summary=summary or "(vide)", transcript=transcript)
+    estimated_tokens = count_tokens(prompt) + max_tokens
+    rate_limiter = get_rate_limiter("openai", model)
+    await rate_limiter.acquire(estimated_tokens)
+    # Internal call: not streamed to the advisor in "messages" stream mode
+    response = await llm.ainvoke(prompt, config={"tags": [TAG_NOSTREAM]})
+    usage = response.usage_metadata or {}
+    if usage:
+        rate_limiter.settle(
+            estimated_tokens, usage.get("total_tokens", estimated_tokens)
+        )
+    return str(response.content).strip()
@@ -0,0 +1,50 @@
+"""Build the search query sent to the retriever from the conversation.
+
+Joining every human message makes the query grow on each turn, which slows
+down embedding and drifts away from the current question. The query is instead
+bounded by a token budget that favours recent turns: the latest question is
+always kept, and each earlier turn may use at most half of what is left.
+"""
+
+from langchain_core.messages import AnyMessage, HumanMessage
+
+from shared.utils import count_tokens, truncate_tokens
+
+
+def build_query(messages: list[AnyMessage], token_budget: int) -> str:
+    """Build a retrieval query from the human turns of a conversation.
+
+    Token counts are memoised by `count_tokens`, so earlier turns are not
+    re-tokenized as the conversation grows and the per-turn cost stays
+    bounded by the budget.
+
+    Args:
+        messages (list[AnyMessage]): The conversation so far.
+        token_budget (int): Maximum number of tokens in the query.
+
+    Returns:
+        str: The query, oldest selected turn first.
+    """
+    turns = [
+        msg.content
+        for msg in messages
+        if isinstance(msg, HumanMessage) and isinstance(msg.content, str)
+    ]
+    if not turns:
+        return ""
+
+    # The current question always comes first in the budget
+    latest = truncate_tokens(turns[-1], token_budget, keep="tail")
+    remaining = token_budget - count_tokens(latest)
+    selected = [latest]
+
+    for turn in reversed(turns[:-1]):
+        share = remaining // 2
+        if share <= 0:
+            break
+        # Keep the end of earlier turns, closest to the current exchange
+        kept = truncate_tokens(turn, share, keep="tail")
+        selected.append(kept)
+        remaining -= count_tokens(kept)
+
+    return " ".join(reversed(selected))
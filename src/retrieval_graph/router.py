@@ -0,0 +1,112 @@
+"""Route each turn before retrieval with a cheap local classifier.
+
+Greetings, thanks and short follow-ups ("précise le volet économique") do not
+need a fresh vector search, and the first two do not need the generation model
+either. The latest human message is classified with keyword rules over the
+same French tokenizer as the lexical index:
+
+- "reply": small talk only, answered directly without retrieval or LLM call;
+- "reuse": a short follow-up on the previous answer that brings no new term,
+  generated from the documents already in the state;
+- "retrieve": everything else, through the full retrieval path.
+
+Route counts are kept per process in `ROUTE_COUNTS`.
+"""
+
+import re
+from collections import Counter
+from typing import Collection, Literal
+
+from langchain_core.messages import AnyMessage, HumanMessage
+
+from shared.lexical import fold, tokenize
+
+Route = Literal["retrieve", "reuse", "reply"]
+
+ROUTE_COUNTS: Counter[str] = Counter()
+
+_GREETINGS = frozenset(tokenize("bonjour bonsoir salut hello coucou hey"))
+_SMALL_TALK = _GREETINGS | frozenset(
+    tokenize(
+        "merci beaucoup remercie parfait super génial top ok okay d'accord "
+        "bonne journée soirée au revoir à bientôt cordialement"
+    )
+)
+
+# Requests to expand on the previous answer rather than ask something new
+_FOLLOW_UP_RE = re.compile(
+    r"\b(?:precise[rz]?|detaille[rz]?|developpe[rz]?|approfondi[rst]?|"
+    r"reformule[rz]?|resume[rz]?|explique[rz]?|plus de details?|"
+    r"(?:le|ce|du|au) volet|(?:cette|ces|la|les) sources?|"
+    r"(?:ce|le) (?:document|rapport)|et (?:sur|pour) (?:le|la|les))\b"
+)
+# Longer messages are treated as new questions even with a follow-up marker
+_FOLLOW_UP_MAX_TERMS = 8
+# Politeness and filler around a follow-up marker, which say nothing new
+_FOLLOW_UP_FILLER = frozenset(
+    tokenize(
+        "peux-tu pouvez-vous pourrais-tu pourriez-vous moi stp svp merci encore "
+        "un peu mieux davantage bien point"
+    )
+)
+
+_GREETING_REPLY = (
+    "Bonjour ! Je suis l'assistant RD-Agri. Posez-moi votre question sur une "
+    "culture, une pratique ou un projet, et je vous répondrai à partir des "
+    "rapports disponibles."
+)
+_SMALL_TALK_REPLY = (
+    "Avec plaisir ! N'hésitez pas à préciser votre demande ou à poser une "
+    "nouvelle question pour enrichir l'analyse."
+)
+
+
+def latest_question(messages: list[AnyMessage]) -> str:
+    """Return the text of the last human message, or an empty string."""
+    for msg in reversed(messages):
+        if isinstance(msg, HumanMessage) and isinstance(msg.content, str):
+            return msg.content
+    return ""
+
+
+def classify(
+    question: str, has_documents: bool, known_terms: Collection[str] = ()
+) -> Route:
+    """Choose the route of a turn.
+
+    A follow-up marker alone is not enough to reuse the documents: every other
+    term of the question must already appear in `known_terms`, so "et pour les
+    vignes en Bourgogne ?" after a question on wheat is still retrieved.
+
+    Args:
+        question (str): The latest human message.
+        has_documents (bool): Whether documents from a previous turn are in the state.
+        known_terms (Collection[str]): Index terms of the previous query and documents.
+
+    Returns:
+        Route: "reply", "reuse" or "retrieve".
+    """
+    terms = tokenize(question)
+    # No index term at all (only stop words): let retrieval decide, as before
+    if not terms:
+        return "retrieve"
+    if all(term in _SMALL_TALK for term in terms):
+        return "reply"
+    if not has_documents or len(terms) > _FOLLOW_UP_MAX_TERMS:
+        return "retrieve"
+    folded = fold(question)
+    if not _FOLLOW_UP_RE.search(folded):
+        return "retrieve"
+    new_terms = [
+        term
+        for term in tokenize(_FOLLOW_UP_RE.sub(" ", folded))
+        if term not in _FOLLOW_UP_FILLER and term not in known_terms
+    ]
+    return "retrieve" if new_terms else "reuse"
+
+
+def direct_reply(question: str) -> str:
+    """Return the canned answer to a small-talk turn."""
+    if any(term in _GREETINGS for term in tokenize(question)):
+        return _GREETING_REPLY
+    return _SMALL_TALK_REPLY
@@ -3,6 +3,7 @@
 This module defines the state structures used in the retrieval graph. It includes
 definitions for agent state, input state, and router classification schema.
 """
+
 from dataclasses import dataclass, field
 from typing import Annotated, List
 
@@ -53,6 +54,14 @@ class InputState:
         If a message in `right` has the same ID as a message in `left`, the
         message from `right` will replace the message from `left`."""
 
+    filters: dict = field(default_factory=dict)
+    """Metadata filter narrowing the search, e.g. {"project_code": "..."}.
+
+    Merged over the `filter` of the configured `search_kwargs`, and pushed down
+    to the vector store and the lexical index.
+    """
+
+
 @dataclass(kw_only=True)
 class GraphState(InputState):
     """Represents the state of our graph.
@@ -63,3 +72,23 @@ class GraphState(InputState):
     """
 
     documents: List[str] = field(default_factory=list)
+    query: str = field(default="")
+    """Search query built from the conversation on the last retrieval."""
+    query_vector: list[float] = field(default_factory=list)
+    """Embedding of `query`, kept from retrieve until the context is packed."""
+    document_vectors: list[list[float]] = field(default_factory=list)
+    """Stored vectors of `documents` as returned by the search, used for MMR.
+
+    Empty when the store could not return a vector for every document, and
+    cleared once the context is packed.
+    """
+    route: str = field(default="retrieve")
+    """Route chosen for the last turn: "retrieve", "reuse" or "reply"."""
+    sources: list[dict] = field(default_factory=list)
+    """Numbered sources (title, year, url) of the last answer; entry n is citation [n]."""
+    summary: str = field(default="")
+    """Rolling summary of the turns that left the verbatim history window."""
+    summarized_messages: int = field(default=0)
+    """Number of leading messages covered by `summary`."""
+    generation_stats: dict = field(default_factory=dict)
+    """Cache hit flag, time to first token, total time and throughput of the last generation."""
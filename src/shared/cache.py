@@ -0,0 +1,157 @@
+"""Persistent key-value cache backed by a local SQLite file.
+
+Values are stored as bytes and evicted in least recently used order once their
+total size exceeds a budget. The index and retrieval graphs build their
+content-addressed caches (page extraction, embeddings) on top of it.
+
+The database runs in WAL mode with `synchronous=NORMAL`, and reads do not
+write: access times of hits are buffered in memory and written in batches (on
+the next put, every `_TOUCH_BATCH` hits and on close). Calls block on SQLite,
+so async callers run them in a worker thread.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, Optional
+
+# Entries read per query while evicting
+_EVICTION_PAGE = 256
+# Buffered access times written at once
+_TOUCH_BATCH = 512
+
+
+class SQLiteCache:
+    """SQLite-backed byte cache with size-based LRU eviction."""
+
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024) -> None:
+        """Open (or create) the cache file.
+
+        Args:
+            path (str): Location of the SQLite database.
+            max_bytes (int): Upper bound on the total size of cached values.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        # The connection is shared by every thread of the process
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_last_access ON entries (last_access)"
+        )
+        self._conn.commit()
+        # Running total of the value sizes, kept up to date by puts and evictions
+        # (writes from other processes are counted when the file is reopened)
+        (self._total,) = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        # Access times of hits not written yet, by key
+        self._touched: dict[str, float] = {}
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached value for `key`, or None on a miss."""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> dict[str, bytes]:
+        """Return the cached values for the keys that are present."""
+        keys = list(dict.fromkeys(keys))
+        found: dict[str, bytes] = {}
+        with self._lock:
+            # Stay well below SQLite's limit on bound parameters
+            for i in range(0, len(keys), 500):
+                batch = keys[i : i + 500]
+                placeholders = ",".join("?" * len(batch))
+                found.update(
+                    self._conn.execute(
+                        f"SELECT key, value FROM entries WHERE key IN ({placeholders})",
+                        batch,
+                    ).fetchall()
+                )
+            if found:
+                now = time.time()
+                self._touched.update((key, now) for key in found)
+                if len(self._touched) >= _TOUCH_BATCH:
+                    self._flush_touches()
+                    self._conn.commit()
+        return found
+
+    def _flush_touches(self) -> None:
+        """Write the buffered access times (the caller commits)."""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE entries SET last_access = ? WHERE key = ?",
+                [(now, key) for key, now in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def put(self, key: str, value: bytes) -> None:
+        """Store `value` under `key` and evict old entries if over budget."""
+        self.put_many({key: value})
+
+    def put_many(self, items: dict[str, bytes]) -> None:
+        """Store several values at once and evict old entries if over budget."""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            # Eviction must see the latest access times
+            self._flush_touches()
+            # Sizes of the entries about to be replaced
+            keys = list(items)
+            for i in range(0, len(keys), 500):
+                batch = keys[i : i + 500]
+                placeholders = ",".join("?" * len(batch))
+                (replaced,) = self._conn.execute(
+                    f"SELECT COALESCE(SUM(size), 0) FROM entries WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchone()
+                self._total -= replaced
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                [(key, value, len(value), now) for key, value in items.items()],
+            )
+            self._total += sum(len(value) for value in items.values())
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        while self._total > self.max_bytes:
+            # Oldest entries first, a page at a time through the last_access index
+            rows = self._conn.execute(
+                "SELECT key, size FROM entries ORDER BY last_access ASC LIMIT ?",
+                (_EVICTION_PAGE,),
+            ).fetchall()
+            if not rows:
+                self._total = 0
+                return
+            stale = []
+            for key, size in rows:
+                if self._total <= self.max_bytes:
+                    break
+                stale.append((key,))
+                self._total -= size
+            self._conn.executemany("DELETE FROM entries WHERE key = ?", stale)
+
+    def close(self) -> None:
+        """Write the buffered access times and close the SQLite connection."""
+        with self._lock:
+            self._flush_touches()
+            self._conn.commit()
+            self._conn.close()
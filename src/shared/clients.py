@@ -0,0 +1,66 @@
+"""Process-wide registry of long-lived clients.
+
+Embedding models, vector stores, chat models and HTTP clients are expensive to
+build: each one opens its own connection pool, and the Pinecone store issues an
+index-describe round-trip on creation. This module builds them lazily, once per
+process and per configuration, so that every graph run reuses warm connections.
+
+Functions:
+    get_or_create: Return the client registered under a key, building it on first use.
+    discard: Forget a registered client.
+    shutdown_clients: Close every registered client that holds resources (including executors).
+"""
+
+import inspect
+import threading
+from typing import Any, Callable, Hashable, TypeVar
+
+C = TypeVar("C")
+
+_registry: dict[Hashable, Any] = {}
+# Re-entrant: a factory may itself fetch shared clients (e.g. an encoder and its cache)
+_lock = threading.RLock()
+
+
+def get_or_create(key: Hashable, factory: Callable[[], C]) -> C:
+    """Return the client registered under `key`, building it with `factory` on first use.
+
+    Args:
+        key (Hashable): Identifies the client and the configuration it was built with.
+        factory (Callable[[], C]): Builds the client when it is not registered yet.
+
+    Returns:
+        C: The shared client instance.
+    """
+    client = _registry.get(key)
+    if client is None:
+        with _lock:
+            client = _registry.get(key)
+            if client is None:
+                client = factory()
+                _registry[key] = client
+    return client
+
+
+def discard(key: Hashable) -> None:
+    """Forget the client registered under `key`, e.g. once it has been closed."""
+    with _lock:
+        _registry.pop(key, None)
+
+
+async def shutdown_clients() -> None:
+    """Close every registered client exposing a `close` (or executor `shutdown`) method and empty the registry."""
+    with _lock:
+        clients = list(_registry.values())
+        _registry.clear()
+    for client in clients:
+        close = getattr(client, "close", None) or getattr(client, "shutdown", None)
+        if close is None:
+            continue
+        result = close()
+        if inspect.isawaitable(result):
+            try:
+                await result
+            except RuntimeError:
+                # Client bound to another (already closed) event loop
+                pass
@@ -26,20 +26,34 @@ class BaseConfiguration:
         },
     )
 
+    embedding_batch_size: int = field(
+        default=64,
+        metadata={
+            "description": "Number of texts sent to the embedding provider per request on cache misses."
+        },
+    )
+
+    embedding_max_concurrency: int = field(
+        default=4,
+        metadata={
+            "description": "Number of embedding requests allowed in flight at the same time."
+        },
+    )
+
     retriever_provider: Annotated[
-        Literal["pinecone"],
+        Literal["pinecone", "local"],
         {"__template_metadata__": {"kind": "retriever"}},
     ] = field(
         default="pinecone",
         metadata={
-            "description": "The vector store provider to use for retrieval. Options are 'elastic', 'pinecone', or 'mongodb'."
+            "description": "The vector store provider to use for retrieval. Options are 'pinecone' or 'local' (in-process, memory-mapped store)."
         },
     )
 
     search_kwargs: dict[str, Any] = field(
         default_factory=lambda: {"k": 10},
         metadata={
-            "description": "Additional keyword arguments to pass to the search function of the retriever."
+            "description": "Additional keyword arguments to pass to the search function of the retriever: 'k', 'score_threshold' and a metadata 'filter' (e.g. {'project_code': 'X', 'publication_year': {'$in': ['2023', '2024']}})."
         },
     )
 
@@ -0,0 +1,179 @@
+"""Caching, batching wrapper around an embedding provider.
+
+Vectors are stored in a persistent `SQLiteCache` keyed by the model name and a
+hash of the text, so repeated chunks and recurring questions are embedded only
+once. Cache misses are sent to the provider in fixed-size batches, with several
+batches in flight at the same time, each one cleared by the provider's shared
+rate limiter.
+"""
+
+import asyncio
+import hashlib
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from shared.cache import SQLiteCache
+from shared.rate_limit import RateLimiter, current_priority
+from shared.utils import count_tokens
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings that read through a persistent cache before calling the provider."""
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        *,
+        model: str,
+        cache: SQLiteCache,
+        batch_size: int = 64,
+        max_concurrency: int = 4,
+        rate_limiter: Optional[RateLimiter] = None,
+    ) -> None:
+        """Wrap `underlying` with a cache.
+
+        Args:
+            underlying (Embeddings): The provider embeddings to call on cache misses.
+            model (str): Fully specified model name, part of every cache key.
+            cache (SQLiteCache): Where vectors are persisted.
+            batch_size (int): Number of texts sent to the provider per request.
+            max_concurrency (int): Number of provider requests in flight at once.
+            rate_limiter (Optional[RateLimiter]): Budget every provider request is taken from.
+        """
+        self.underlying = underlying
+        self.model = model
+        self.cache = cache
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = rate_limiter
+
+    def _key(self, text: str, kind: str) -> str:
+        """Return the cache key of `text` for this model.
+
+        Some providers embed queries and documents differently, so `kind` is
+        part of the key.
+        """
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.model}:{kind}:{digest}"
+
+    def _lookup(
+        self, texts: list[str], kind: str
+    ) -> tuple[dict[str, list[float]], list[str]]:
+        """Split `texts` into cached vectors (by key) and distinct missing texts."""
+        keys = {text: self._key(text, kind) for text in texts}
+        found = {
+            key: array("f", value).tolist()
+            for key, value in self.cache.get_many(keys.values()).items()
+        }
+        missing = [text for text, key in keys.items() if key not in found]
+        return found, missing
+
+    def _store(
+        self,
+        found: dict[str, list[float]],
+        texts: list[str],
+        vectors: list[list[float]],
+        kind: str,
+    ) -> None:
+        """Persist freshly computed vectors and merge them into `found`."""
+        fresh = {self._key(text, kind): vector for text, vector in zip(texts, vectors)}
+        self.cache.put_many(
+            {key: array("f", vector).tobytes() for key, vector in fresh.items()}
+        )
+        found.update(fresh)
+
+    async def _alookup(
+        self, texts: list[str], kind: str
+    ) -> tuple[dict[str, list[float]], list[str]]:
+        """`_lookup` in a worker thread, off the event loop."""
+        return await asyncio.to_thread(self._lookup, texts, kind)
+
+    async def _astore(
+        self,
+        found: dict[str, list[float]],
+        texts: list[str],
+        vectors: list[list[float]],
+        kind: str,
+    ) -> None:
+        """`_store` in a worker thread, off the event loop."""
+        await asyncio.to_thread(self._store, found, texts, vectors, kind)
+
+    def _batches(self, texts: list[str]) -> list[list[str]]:
+        """Cut `texts` into provider-sized batches."""
+        return [
+            texts[i : i + self.batch_size]
+            for i in range(0, len(texts), self.batch_size)
+        ]
+
+    async def _throttle(self, texts: list[str]) -> None:
+        """Wait for the rate limiter to clear a request embedding `texts`."""
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire(sum(count_tokens(text) for text in texts))
+
+    def _embed(
+        self,
+        texts: list[str],
+        embed_batch: Callable[[list[str]], list[list[float]]],
+        kind: str,
+    ) -> list[list[float]]:
+        """Embed `texts` through the cache using a synchronous provider call."""
+        found, missing = self._lookup(texts, kind)
+        if missing:
+            # Worker threads do not inherit the caller's context (and priority)
+            level = current_priority()
+
+            def throttled_batch(batch: list[str]) -> list[list[float]]:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.acquire_sync(
+                        sum(count_tokens(text) for text in batch), level
+                    )
+                return embed_batch(batch)
+
+            batches = self._batches(missing)
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                results = list(executor.map(throttled_batch, batches))
+            self._store(
+                found, missing, [v for vectors in results for v in vectors], kind
+            )
+        return [found[self._key(text, kind)] for text in texts]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed search documents, reusing cached vectors."""
+        return self._embed(texts, self.underlying.embed_documents, "document")
+
+    def embed_query(self, text: str) -> list[float]:
+        """Embed a query, reusing a cached vector."""
+        return self._embed(
+            [text], lambda batch: [self.underlying.embed_query(batch[0])], "query"
+        )[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Asynchronously embed search documents, reusing cached vectors."""
+        found, missing = await self._alookup(texts, "document")
+        if missing:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+
+            async def embed_batch(batch: list[str]) -> list[list[float]]:
+                async with semaphore:
+                    await self._throttle(batch)
+                    return await self.underlying.aembed_documents(batch)
+
+            results = await asyncio.gather(
+                *(embed_batch(batch) for batch in self._batches(missing))
+            )
+            await self._astore(
+                found, missing, [v for vectors in results for v in vectors], "document"
+            )
+        return [found[self._key(text, "document")] for text in texts]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        """Asynchronously embed a query, reusing a cached vector."""
+        found, missing = await self._alookup([text], "query")
+        if missing:
+            await self._throttle(missing)
+            vector = await self.underlying.aembed_query(text)
+            await self._astore(found, missing, [vector], "query")
+        return found[self._key(text, "query")]
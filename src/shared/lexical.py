@@ -0,0 +1,238 @@
+"""Local BM25 index over indexed chunks, and rank fusion with vector results.
+
+Agronomic questions are full of exact terms (crop varieties, product names,
+project codes, acronyms) that embedding search tends to blur. This module keeps
+a full-text index of every indexed chunk in a local SQLite file, searched with
+BM25, so that exact-term matches can be fused with vector results through
+reciprocal rank fusion.
+
+Tokenisation is French-aware: text is case- and accent-folded, elisions
+(l', d', qu'...) are split off, stop words are dropped and words are reduced
+with a light suffix-stripping stemmer.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter
+from typing import Any, Iterable, Optional
+
+from langchain_core.documents import Document
+
+from shared import clients
+from shared.utils import matches_filter
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+_ELISION_RE = re.compile(r"\b(?:l|d|j|m|n|s|t|c|qu|jusqu|lorsqu|puisqu)['’]")
+
+_STOP_WORDS = frozenset(
+    """
+    a au aux avec ce ces cet cette dans de des du elle elles en est et etre eu
+    il ils je la le les leur leurs lui ma mais me meme mes moi mon ne nos notre
+    nous on ou par pas pour qu que qui sa se ses son sont sur ta te tes toi ton
+    tu un une vos votre vous y sans sous entre plus moins tres comme fait faire
+    peut etc aussi ainsi donc or ni car si quel quelle quels quelles
+    """.split()
+)
+
+# Longest first, so that e.g. "ements" wins over "s"
+_SUFFIXES = sorted(
+    """
+    issements issement ements ement ations ation atrices atrice ateurs ateur
+    ances ance ences ence ismes isme istes iste ites ite ives ive ifs if euses
+    euse eux ables able ibles ible ments ment antes ante ants ant ees ee es e s x
+    """.split(),
+    key=len,
+    reverse=True,
+)
+
+
+def fold(text: str) -> str:
+    """Lowercase `text` and strip accents."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def stem(word: str) -> str:
+    """Reduce a folded French word with light suffix stripping.
+
+    Words with digits (product codes, years, project codes) are kept intact.
+    """
+    if len(word) <= 4 or any(c.isdigit() for c in word):
+        return word
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> list[str]:
+    """Split French text into stemmed, stop-word-free index terms."""
+    folded = _ELISION_RE.sub(" ", fold(text).replace("’", "'"))
+    return [
+        stem(token) for token in _TOKEN_RE.findall(folded) if token not in _STOP_WORDS
+    ]
+
+
+def content_key(doc: Document) -> str:
+    """Identify a chunk by its content, so lexical and vector hits can be matched."""
+    return hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+
+
+class LexicalIndex:
+    """Incremental BM25 index stored in a local SQLite file.
+
+    Chunks are indexed in an FTS5 table holding their terms as produced by
+    `tokenize`, and ranked with FTS5's `bm25()` (k1 = 1.2, b = 0.75), which keeps
+    document counts and lengths up to date as chunks are added and removed.
+    Writes go through one connection under a lock; each reading thread has its
+    own connection, so searches do not wait for each other.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Open (or create) the index.
+
+        Args:
+            path (str): Location of the SQLite database.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._readers: list[sqlite3.Connection] = []
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # Readers see the last committed state while a write is in progress
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS docs (
+                id TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                length INTEGER NOT NULL
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS doc_terms USING fts5(
+                terms, tokenize = "unicode61 tokenchars '-_.'"
+            );
+            """
+        )
+        self._conn.commit()
+
+    def _reader(self) -> sqlite3.Connection:
+        """Return the read connection of the calling thread."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._local.conn = conn
+            with self._lock:
+                self._readers.append(conn)
+        return conn
+
+    def add_documents(self, docs: Iterable[Document]) -> None:
+        """Index `docs` under their id (or content hash); a chunk already present is left unchanged."""
+        rows = []
+        for doc in docs:
+            terms = tokenize(doc.page_content)
+            rows.append(
+                (
+                    doc.id or content_key(doc),
+                    doc.page_content,
+                    json.dumps(doc.metadata, ensure_ascii=False),
+                    len(terms),
+                    " ".join(terms),
+                )
+            )
+        with self._lock:
+            for doc_id, text, metadata, length, terms in rows:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO docs (id, text, metadata, length) "
+                    "VALUES (?, ?, ?, ?)",
+                    (doc_id, text, metadata, length),
+                )
+                if cursor.rowcount:
+                    self._conn.execute(
+                        "INSERT INTO doc_terms (rowid, terms) VALUES (?, ?)",
+                        (cursor.lastrowid, terms),
+                    )
+            self._conn.commit()
+
+    def delete(self, ids: Iterable[str]) -> None:
+        """Remove the chunks indexed under `ids`."""
+        rows = [(doc_id,) for doc_id in ids]
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM doc_terms WHERE rowid = (SELECT rowid FROM docs WHERE id = ?)",
+                rows,
+            )
+            self._conn.executemany("DELETE FROM docs WHERE id = ?", rows)
+            self._conn.commit()
+
+    def search(
+        self, query: str, k: int = 10, filter: Optional[dict[str, Any]] = None
+    ) -> list[Document]:
+        """Return the `k` best BM25 matches for `query`, restricted by a metadata `filter`."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or k <= 0:
+            return []
+        # Any of the query terms, each quoted so it is read as a plain term
+        match = " OR ".join(f'"{term}"' for term in terms)
+        cursor = self._reader().execute(
+            "SELECT d.id, d.text, d.metadata FROM doc_terms t "
+            "JOIN docs d ON d.rowid = t.rowid "
+            "WHERE doc_terms MATCH ? ORDER BY rank",
+            (match,),
+        )
+        results: list[Document] = []
+        # Rows are read lazily, best first, until k of them pass the filter
+        for doc_id, text, metadata in cursor:
+            metadata = json.loads(metadata)
+            if filter and not matches_filter(metadata, filter):
+                continue
+            results.append(Document(id=doc_id, page_content=text, metadata=metadata))
+            if len(results) == k:
+                break
+        cursor.close()
+        return results
+
+    def close(self) -> None:
+        """Close the underlying SQLite connections."""
+        with self._lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+            self._conn.close()
+
+
+def make_lexical_index(path: Optional[str] = None) -> LexicalIndex:
+    """Return the process-wide lexical index."""
+    path = path or os.getenv("LEXICAL_INDEX_PATH", ".cache/lexical.sqlite")
+    return clients.get_or_create(("lexical_index", path), lambda: LexicalIndex(path))
+
+
+def reciprocal_rank_fusion(
+    rankings: Iterable[list[Document]], *, k: int = 60, limit: Optional[int] = None
+) -> list[Document]:
+    """Fuse ranked lists of documents with reciprocal rank fusion.
+
+    Args:
+        rankings (Iterable[list[Document]]): Result lists, best first.
+        k (int): RRF damping constant; higher values flatten rank differences.
+        limit (Optional[int]): Number of fused documents to return.
+
+    Returns:
+        list[Document]: Documents ordered by fused score.
+    """
+    scores: Counter[str] = Counter()
+    docs: dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key = content_key(doc)
+            scores[key] += 1 / (k + rank + 1)
+            docs.setdefault(key, doc)
+    return [docs[key] for key, _ in scores.most_common(limit)]
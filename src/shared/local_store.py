@@ -0,0 +1,561 @@
+"""In-process vector store persisted as a memory-mapped embedding matrix.
+
+The store lives in a directory holding:
+
+- `vectors.f32`: L2-normalised float32 embeddings, one row per chunk, appended
+  as documents are added and memory-mapped on open, so that opening the store
+  does not read the matrix into RAM;
+- `docs.jsonl`: the metadata sidecar, one line per row (id, text, metadata),
+  plus tombstone lines for deleted ids. Only the ids, metadata and line
+  offsets are kept in memory; texts are read from the file when documents are
+  returned;
+- `meta.json`: the embedding dimension and the number of committed rows,
+  rewritten after each append. Rows beyond that count (left by an interrupted
+  write) are cut off both files on open;
+- `hnsw.bin`: an HNSW index over the rows, when the optional `hnswlib`
+  package is installed. Without it, searches scan the memory-mapped matrix.
+  hnswlib holds its own in-RAM copy of the vectors, so the index costs about
+  the size of `vectors.f32` in memory. It is saved on `checkpoint()`, on
+  `close()` (also registered to run at interpreter exit) and every
+  `CHECKPOINT_ROWS` added rows, not on every append; rows added since the last
+  save are inserted again on open. A missing or unreadable index is rebuilt in
+  a background thread on large stores, and searches scan the matrix until it
+  is ready.
+
+It lets the graphs run on-prem or offline and keeps the vector search off the
+network. Metadata filters are supported: equality on the fields attached at
+indexing time is resolved through an in-memory metadata index, and the search
+then only scores the matching rows.
+"""
+
+import atexit
+import json
+import os
+import threading
+import uuid
+from typing import Any, Iterable, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from shared.utils import matches_filter
+
+# Metadata fields indexed in memory to resolve equality filters without a scan
+INDEXED_FIELDS = ("project_code", "publication_year", "publisher")
+# Rows added between two automatic saves of the HNSW index
+CHECKPOINT_ROWS = 50_000
+# Above this many rows, a missing HNSW index is rebuilt in a background thread
+BACKGROUND_BUILD_ROWS = 10_000
+
+
+class LocalVectorStore(VectorStore):
+    """Vector store backed by a memory-mapped float32 matrix and a JSONL sidecar."""
+
+    def __init__(self, path: str, embedding: Embeddings) -> None:
+        """Open (or create) the store at `path`.
+
+        Args:
+            path (str): Directory holding the store files.
+            embedding (Embeddings): Model used to embed added texts and queries.
+        """
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._embedding = embedding
+        self._lock = threading.Lock()
+        self._ids: list[str] = []
+        # Byte offset of each row's line in the sidecar, and its metadata
+        self._offsets: list[int] = []
+        self._metadatas: list[dict] = []
+        self._rows: dict[str, int] = {}
+        self._deleted: set[int] = set()
+        self._dim: Optional[int] = None
+        self._vectors: Optional[np.ndarray] = None
+        self._hnsw: Any = None
+        self._hnsw_building = False
+        # Rows added or deleted since the HNSW index was last saved
+        self._unsaved = 0
+        self._metadata_index: dict[str, dict[Any, set[int]]] = {
+            field: {} for field in INDEXED_FIELDS
+        }
+        self._load()
+        # Long-running servers never close their stores explicitly
+        atexit.register(self.close)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        """Return the embedding model of the store."""
+        return self._embedding
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.path, "vectors.f32")
+
+    @property
+    def _docs_path(self) -> str:
+        return os.path.join(self.path, "docs.jsonl")
+
+    @property
+    def _hnsw_path(self) -> str:
+        return os.path.join(self.path, "hnsw.bin")
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.path, "meta.json")
+
+    def _load(self) -> None:
+        """Read the sidecar, drop uncommitted rows and map the embedding matrix."""
+        meta: dict[str, Any] = {"dim": None, "rows": 0}
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        self._dim = meta["dim"]
+        vector_bytes = (
+            os.path.getsize(self._vectors_path)
+            if os.path.exists(self._vectors_path)
+            else 0
+        )
+        # Committed rows: those counted in the meta file and fully written to the
+        # matrix. Without a meta file, no append ever completed.
+        limit = min(meta["rows"], vector_bytes // (4 * self._dim)) if self._dim else 0
+
+        docs_end = 0
+        if os.path.exists(self._docs_path):
+            with open(self._docs_path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # Partially written last line
+                    record = json.loads(line)
+                    if record.get("deleted"):
+                        row = self._rows.pop(record["id"], None)
+                        if row is not None:
+                            self._deleted.add(row)
+                        docs_end += len(line)
+                        continue
+                    if len(self._ids) >= limit:
+                        break
+                    if record["id"] in self._rows:
+                        self._deleted.add(self._rows[record["id"]])
+                    self._rows[record["id"]] = len(self._ids)
+                    self._index_metadata(len(self._ids), record["metadata"])
+                    self._ids.append(record["id"])
+                    self._offsets.append(docs_end)
+                    self._metadatas.append(record["metadata"])
+                    docs_end += len(line)
+            # Cut off what an interrupted write left after the last committed row
+            if os.path.getsize(self._docs_path) > docs_end:
+                os.truncate(self._docs_path, docs_end)
+        committed_bytes = 4 * (self._dim or 0) * len(self._ids)
+        if vector_bytes > committed_bytes:
+            os.truncate(self._vectors_path, committed_bytes)
+        self._map_vectors()
+        self._load_hnsw()
+
+    def _write_meta(self) -> None:
+        """Record the dimension and committed row count, atomically."""
+        tmp_path = self._meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"dim": self._dim, "rows": len(self._ids)}, f)
+        os.replace(tmp_path, self._meta_path)
+
+    def _index_metadata(self, row: int, metadata: dict) -> None:
+        """Register `row` under the values of its indexed metadata fields."""
+        for field in INDEXED_FIELDS:
+            value = metadata.get(field)
+            if value is not None:
+                self._metadata_index[field].setdefault(value, set()).add(row)
+
+    def _filtered_rows(self, filter: dict[str, Any]) -> np.ndarray:
+        """Return the live rows whose metadata passes `filter`."""
+        rows: Optional[set[int]] = None
+        # Narrow down with the metadata index where the filter allows it
+        for field, condition in filter.items():
+            if field not in self._metadata_index:
+                continue
+            if isinstance(condition, dict):
+                if set(condition) == {"$eq"}:
+                    values = [condition["$eq"]]
+                elif set(condition) == {"$in"}:
+                    values = list(condition["$in"])
+                else:
+                    continue
+            else:
+                values = [condition]
+            matched = set().union(
+                *(self._metadata_index[field].get(value, set()) for value in values)
+            )
+            rows = matched if rows is None else rows & matched
+        candidates = range(len(self._ids)) if rows is None else sorted(rows)
+        return np.fromiter(
+            (
+                row
+                for row in candidates
+                if row not in self._deleted
+                and matches_filter(self._metadatas[row], filter)
+            ),
+            dtype=np.int64,
+        )
+
+    def _map_vectors(self) -> None:
+        """(Re)map the embedding matrix read-only."""
+        if not self._ids or self._dim is None:
+            self._vectors = None
+            return
+        self._vectors = np.memmap(
+            self._vectors_path,
+            dtype=np.float32,
+            mode="r",
+            shape=(len(self._ids), self._dim),
+        )
+
+    def _load_hnsw(self) -> None:
+        """Open or build the HNSW index when hnswlib is available."""
+        try:
+            import hnswlib  # type: ignore
+        except ImportError:
+            return
+        if self._dim is None or self._hnsw_building:
+            return
+        count = len(self._ids)
+        index = None
+        if os.path.exists(self._hnsw_path):
+            index = hnswlib.Index(space="ip", dim=self._dim)
+            try:
+                index.load_index(self._hnsw_path, max_elements=max(count, 1024))
+            except RuntimeError:
+                index = None
+        if index is not None and index.get_current_count() <= count:
+            self._hnsw = self._catch_up(index)
+            return
+        # Missing, unreadable or ahead of the committed rows: rebuild
+        if count > BACKGROUND_BUILD_ROWS:
+            self._hnsw_building = True
+            threading.Thread(target=self._build_hnsw, daemon=True).start()
+        else:
+            self._hnsw = self._catch_up(self._new_hnsw(count))
+
+    def _new_hnsw(self, capacity: int) -> Any:
+        """Return an empty HNSW index for `capacity` rows."""
+        import hnswlib  # type: ignore
+
+        index = hnswlib.Index(space="ip", dim=self._dim)
+        index.init_index(max_elements=max(capacity, 1024), ef_construction=200, M=16)
+        return index
+
+    def _catch_up(self, index: Any) -> Any:
+        """Insert the rows added and mark the rows deleted since `index` was built."""
+        count = len(self._ids)
+        saved = index.get_current_count()
+        if count > index.get_max_elements():
+            index.resize_index(count)
+        if saved < count and self._vectors is not None:
+            index.add_items(np.asarray(self._vectors[saved:]), np.arange(saved, count))
+            self._unsaved += count - saved
+        for row in self._deleted:
+            try:
+                index.mark_deleted(row)
+            except RuntimeError:
+                pass  # Already marked in the saved index
+        index.set_ef(64)
+        return index
+
+    def _build_hnsw(self) -> None:
+        """Build the HNSW index off the calling thread, then install and save it."""
+        count = len(self._ids)
+        vectors = self._vectors
+        index = self._new_hnsw(count)
+        if vectors is not None:
+            # Rows appended meanwhile are added under the lock below
+            index.add_items(np.asarray(vectors[:count]), np.arange(count))
+        with self._lock:
+            self._hnsw = self._catch_up(index)
+            self._hnsw_building = False
+            self._hnsw.save_index(self._hnsw_path)
+            self._unsaved = 0
+
+    def checkpoint(self) -> None:
+        """Save the HNSW index if rows were added or deleted since the last save."""
+        with self._lock:
+            if self._hnsw is not None and self._unsaved:
+                self._hnsw.save_index(self._hnsw_path)
+                self._unsaved = 0
+
+    def close(self) -> None:
+        """Save the HNSW index before the store is dropped."""
+        self.checkpoint()
+        atexit.unregister(self.close)
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[list[dict]] = None,
+        *,
+        ids: Optional[list[str]] = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        """Embed and append texts; re-adding an existing id replaces it."""
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        vectors = _normalise(self._embedding.embed_documents(texts))
+        self._append(texts, metadatas, ids, vectors)
+        return ids
+
+    async def aadd_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[list[dict]] = None,
+        *,
+        ids: Optional[list[str]] = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        """Embed asynchronously and append texts; re-adding an existing id replaces it."""
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        vectors = _normalise(await self._embedding.aembed_documents(texts))
+        self._append(texts, metadatas, ids, vectors)
+        return ids
+
+    def _append(
+        self,
+        texts: list[str],
+        metadatas: list[dict],
+        ids: list[str],
+        vectors: np.ndarray,
+    ) -> None:
+        """Persist new rows and update the in-memory views."""
+        with self._lock:
+            if self._dim is None:
+                self._dim = int(vectors.shape[1])
+            start = len(self._ids)
+            with open(self._vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+            offsets = []
+            with open(self._docs_path, "ab") as f:
+                for id_, text, metadata in zip(ids, texts, metadatas):
+                    record = {"id": id_, "text": text, "metadata": metadata}
+                    offsets.append(f.tell())
+                    f.write((json.dumps(record, ensure_ascii=False) + "\n").encode())
+            replaced = []
+            for row, (id_, metadata, line_offset) in enumerate(
+                zip(ids, metadatas, offsets), start
+            ):
+                if id_ in self._rows:
+                    replaced.append(self._rows[id_])
+                    self._deleted.add(self._rows[id_])
+                self._rows[id_] = row
+                self._index_metadata(row, metadata)
+                self._ids.append(id_)
+                self._offsets.append(line_offset)
+                self._metadatas.append(metadata)
+            # Commit point: rows past the recorded count are dropped on open
+            self._write_meta()
+            self._map_vectors()
+
+            if self._hnsw is None:
+                self._load_hnsw()
+            else:
+                needed = len(self._ids)
+                capacity = self._hnsw.get_max_elements()
+                if needed > capacity:
+                    self._hnsw.resize_index(max(needed, 2 * capacity))
+                self._hnsw.add_items(vectors, np.arange(start, needed))
+                for row in replaced:
+                    self._hnsw.mark_deleted(row)
+                self._unsaved += len(ids)
+            if self._hnsw is not None and self._unsaved >= CHECKPOINT_ROWS:
+                self._hnsw.save_index(self._hnsw_path)
+                self._unsaved = 0
+
+    def delete(self, ids: Optional[list[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """Delete documents by id."""
+        if not ids:
+            return False
+        with self._lock:
+            with open(self._docs_path, "a", encoding="utf-8") as f:
+                for id_ in ids:
+                    row = self._rows.pop(id_, None)
+                    if row is None:
+                        continue
+                    self._deleted.add(row)
+                    f.write(json.dumps({"id": id_, "deleted": True}) + "\n")
+                    if self._hnsw is not None:
+                        self._hnsw.mark_deleted(row)
+                        self._unsaved += 1
+        return True
+
+    def get_by_ids(self, ids: list[str], /) -> list[Document]:
+        """Return the documents stored under `ids`."""
+        return self._documents(
+            [row for id_ in ids if (row := self._rows.get(id_)) is not None]
+        )
+
+    def _documents(self, rows: list[int]) -> list[Document]:
+        """Read the documents stored at `rows` from the sidecar, with their ids."""
+        if not rows:
+            return []
+        docs = []
+        with open(self._docs_path, "rb") as f:
+            for row in rows:
+                f.seek(self._offsets[row])
+                record = json.loads(f.readline())
+                docs.append(
+                    Document(
+                        id=self._ids[row],
+                        page_content=record["text"],
+                        metadata=record["metadata"],
+                    )
+                )
+        return docs
+
+    def _nearest_rows(
+        self,
+        embedding: list[float],
+        k: int,
+        filter: Optional[dict[str, Any]] = None,
+    ) -> list[tuple[int, float]]:
+        """Return the `k` nearest live rows to `embedding` with their cosine similarity."""
+        if self._vectors is None:
+            return []
+        query = _normalise([embedding])[0]
+
+        if filter:
+            # Score only the rows that pass the filter
+            rows = self._filtered_rows(filter)
+            if not len(rows):
+                return []
+            scores = np.asarray(self._vectors[rows] @ query)
+            top = np.argsort(-scores)[:k]
+            return [(int(rows[i]), float(scores[i])) for i in top]
+
+        live = len(self._ids) - len(self._deleted)
+        wanted = min(k, live)
+        if wanted <= 0:
+            return []
+
+        candidates = None
+        if self._hnsw is not None:
+            # Deleted rows are marked in the index and never returned
+            try:
+                labels, distances = self._hnsw.knn_query(query, k=wanted)
+            except RuntimeError:
+                pass  # Too few reachable live rows: fall back to the scan
+            else:
+                candidates = [
+                    (int(row), 1.0 - float(distance))
+                    for row, distance in zip(labels[0], distances[0])
+                ]
+        if candidates is None:
+            scores = np.asarray(self._vectors @ query)
+            if self._deleted:
+                scores[list(self._deleted)] = -np.inf
+            top = np.argpartition(-scores, wanted - 1)[:wanted]
+            candidates = [(int(row), float(scores[row])) for row in top]
+
+        results = [
+            (row, score) for row, score in candidates if row not in self._deleted
+        ]
+        results.sort(key=lambda pair: pair[1], reverse=True)
+        return results[:k]
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        filter: Optional[dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> list[tuple[Document, float]]:
+        """Return the `k` nearest documents to `embedding` with their cosine similarity.
+
+        Args:
+            embedding (list[float]): The query embedding.
+            k (int): Number of documents to return.
+            filter (Optional[dict[str, Any]]): Pinecone-style metadata filter.
+        """
+        nearest = self._nearest_rows(embedding, k, filter)
+        docs = self._documents([row for row, _ in nearest])
+        return [(doc, score) for doc, (_, score) in zip(docs, nearest)]
+
+    def similarity_search_with_vectors_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        filter: Optional[dict[str, Any]] = None,
+    ) -> list[tuple[Document, float, list[float]]]:
+        """Like `similarity_search_with_score_by_vector`, plus the stored vector of each hit.
+
+        The vectors are read from the matrix (unit length), so callers can rerank
+        the hits without embedding them again.
+        """
+        nearest = self._nearest_rows(embedding, k, filter)
+        docs = self._documents([row for row, _ in nearest])
+        return [
+            (doc, score, self._vectors[row].tolist())
+            for doc, (row, score) in zip(docs, nearest)
+        ]
+
+    def get_vectors(self, ids: list[str]) -> dict[str, list[float]]:
+        """Return the stored (unit-length) vectors of `ids`, skipping unknown ids."""
+        if self._vectors is None:
+            return {}
+        return {
+            id_: self._vectors[row].tolist()
+            for id_ in ids
+            if (row := self._rows.get(id_)) is not None
+        }
+
+    def similarity_search_by_vector(
+        self, embedding: list[float], k: int = 4, **kwargs: Any
+    ) -> list[Document]:
+        """Return the `k` nearest documents to `embedding`."""
+        pairs = self.similarity_search_with_score_by_vector(embedding, k, **kwargs)
+        return [doc for doc, _ in pairs]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> list[tuple[Document, float]]:
+        """Return the `k` nearest documents to `query` with their cosine similarity."""
+        return self.similarity_search_with_score_by_vector(
+            self._embedding.embed_query(query), k, **kwargs
+        )
+
+    def similarity_search(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> list[Document]:
+        """Return the `k` nearest documents to `query`."""
+        return self.similarity_search_by_vector(
+            self._embedding.embed_query(query), k, **kwargs
+        )
+
+    def _select_relevance_score_fn(self):  # type: ignore[no-untyped-def]
+        """Scores are already cosine similarities."""
+        return lambda score: score
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: list[str],
+        embedding: Embeddings,
+        metadatas: Optional[list[dict]] = None,
+        *,
+        ids: Optional[list[str]] = None,
+        path: str = ".cache/vector_store",
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        """Create a store at `path` and add `texts` to it."""
+        store = cls(path, embedding)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
+
+
+def _normalise(vectors: list[list[float]]) -> np.ndarray:
+    """Return `vectors` as unit-length float32 rows."""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
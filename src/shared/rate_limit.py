@@ -0,0 +1,219 @@
+"""Process-wide rate limiting of LLM and embedding provider calls.
+
+Index runs, bulk ingestion and the retrieval graph share the same provider
+quotas. Rather than each caller discovering the limit through 429 responses and
+backing off on its own, every call first takes capacity from a limiter shared
+per provider and model. A limiter holds two token buckets, one counted in
+requests per minute and one in tokens per minute, refilled continuously. Bucket
+sizes start from defaults (overridable with `<PROVIDER>_REQUESTS_PER_MINUTE`
+and `<PROVIDER>_TOKENS_PER_MINUTE`) and then follow the `x-ratelimit-*` /
+`anthropic-ratelimit-*` headers of the responses.
+
+Waiting callers are served in priority order, so interactive retrieval traffic
+goes ahead of background indexing. The priority of the running task is carried
+by a context variable set with `priority()`.
+
+Functions:
+    get_rate_limiter: Return the shared limiter of a provider and model.
+    priority: Context manager setting the priority of calls made inside it.
+    current_priority: Return the priority of the running task.
+
+Classes:
+    RateLimiter: Request and token buckets with a priority queue of waiters.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from typing import Iterator, Mapping, Optional
+
+from shared import clients
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar(
+    "rate_limit_priority", default=INTERACTIVE
+)
+
+# (requests/min, tokens/min) until the provider's headers say otherwise
+_DEFAULT_LIMITS = {"openai": (500, 200_000), "anthropic": (50, 40_000)}
+_FALLBACK_LIMITS = (60, 100_000)
+# Longest sleep between two checks, so a newly arrived interactive call is not
+# stuck behind a background call waiting for a refill
+_MAX_SLEEP = 0.25
+_POLL_INTERVAL = 0.02
+
+
+@contextlib.contextmanager
+def priority(level: int) -> Iterator[None]:
+    """Run the enclosed calls (and the tasks they create) at priority `level`."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    """Return the priority of the running task (INTERACTIVE by default)."""
+    return _priority.get()
+
+
+class _Bucket:
+    """Token bucket holding at most `capacity` units, refilled over a minute."""
+
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(
+            self.capacity, self.level + (now - self.updated) * self.capacity / 60
+        )
+        self.updated = now
+
+    def wait_for(self, amount: float) -> float:
+        """Seconds until `amount` units are available (capped at the capacity)."""
+        missing = min(amount, self.capacity) - self.level
+        return max(missing, 0.0) * 60 / self.capacity
+
+
+class RateLimiter:
+    """Requests/min and tokens/min budget of one provider model, shared by all callers."""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float) -> None:
+        """Start with full buckets of the given sizes."""
+        self._requests = _Bucket(requests_per_minute)
+        self._tokens = _Bucket(tokens_per_minute)
+        self._lock = threading.Lock()
+        self._waiters: list[tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+
+    def _enqueue(self, level: Optional[int]) -> tuple[int, int]:
+        ticket = (current_priority() if level is None else level, next(self._sequence))
+        with self._lock:
+            heapq.heappush(self._waiters, ticket)
+        return ticket
+
+    def _dequeue(self, ticket: tuple[int, int]) -> None:
+        with self._lock:
+            if ticket in self._waiters:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+
+    def _try_acquire(self, ticket: tuple[int, int], tokens: int) -> float:
+        """Take capacity if `ticket` is first in line; otherwise return seconds to wait."""
+        with self._lock:
+            if self._waiters[0] != ticket:
+                return _POLL_INTERVAL
+            now = time.monotonic()
+            if now < self._paused_until:
+                return min(self._paused_until - now, _MAX_SLEEP)
+            self._requests.refill(now)
+            self._tokens.refill(now)
+            wait = max(self._requests.wait_for(1), self._tokens.wait_for(tokens))
+            if wait > 0:
+                return min(wait, _MAX_SLEEP)
+            self._requests.level -= 1
+            self._tokens.level -= min(tokens, self._tokens.capacity)
+            heapq.heappop(self._waiters)
+            return 0.0
+
+    async def acquire(self, tokens: int = 0, level: Optional[int] = None) -> None:
+        """Wait until one request and `tokens` tokens can be spent.
+
+        Args:
+            tokens (int): Estimated tokens of the call (prompt and completion).
+            level (Optional[int]): Priority; defaults to that of the running task.
+        """
+        ticket = self._enqueue(level)
+        try:
+            while (wait := self._try_acquire(ticket, tokens)) > 0:
+                await asyncio.sleep(wait)
+        except BaseException:
+            self._dequeue(ticket)
+            raise
+
+    def acquire_sync(self, tokens: int = 0, level: Optional[int] = None) -> None:
+        """Blocking counterpart of `acquire`, for synchronous provider calls."""
+        ticket = self._enqueue(level)
+        try:
+            while (wait := self._try_acquire(ticket, tokens)) > 0:
+                time.sleep(wait)
+        except BaseException:
+            self._dequeue(ticket)
+            raise
+
+    def settle(self, estimated: int, actual: int) -> None:
+        """Correct the token bucket once the real usage of a call is known."""
+        with self._lock:
+            self._tokens.level = min(
+                self._tokens.capacity, self._tokens.level + estimated - actual
+            )
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller for `seconds`, e.g. after a 429."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """Align the buckets with the limits and remaining quota reported by the provider."""
+        lowered = {key.lower(): value for key, value in headers.items()}
+        with self._lock:
+            now = time.monotonic()
+            for bucket, name in (
+                (self._requests, "requests"),
+                (self._tokens, "tokens"),
+            ):
+                bucket.refill(now)
+                limit = _header_number(
+                    lowered,
+                    f"x-ratelimit-limit-{name}",
+                    f"anthropic-ratelimit-{name}-limit",
+                )
+                remaining = _header_number(
+                    lowered,
+                    f"x-ratelimit-remaining-{name}",
+                    f"anthropic-ratelimit-{name}-remaining",
+                )
+                if limit:
+                    bucket.capacity = limit
+                    bucket.level = min(bucket.level, limit)
+                if remaining is not None:
+                    bucket.level = min(bucket.level, remaining)
+        retry_after = _header_number(lowered, "retry-after")
+        if retry_after:
+            self.pause(retry_after)
+
+
+def _header_number(headers: Mapping[str, str], *names: str) -> Optional[float]:
+    """Return the first of `names` present in `headers` as a number."""
+    for name in names:
+        try:
+            return float(headers[name])
+        except (KeyError, ValueError):
+            continue
+    return None
+
+
+def get_rate_limiter(provider: str, model: str) -> RateLimiter:
+    """Return the limiter shared by every call to `model` of `provider` in this process."""
+    provider = provider or "openai"
+
+    def create() -> RateLimiter:
+        requests, tokens = _DEFAULT_LIMITS.get(provider, _FALLBACK_LIMITS)
+        prefix = provider.upper()
+        return RateLimiter(
+            float(os.getenv(f"{prefix}_REQUESTS_PER_MINUTE", requests)),
+            float(os.getenv(f"{prefix}_TOKENS_PER_MINUTE", tokens)),
+        )
+
+    return clients.get_or_create(("rate_limiter", provider, model), create)
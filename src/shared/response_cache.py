@@ -0,0 +1,150 @@
+"""Exact-match cache of generated answers.
+
+During seasonal peaks the same question comes back with the same retrieved
+chunks, and the answer at temperature 0 is the same. This module caches the
+answer text under a key built from the normalised tail of the conversation, the
+sorted IDs of the retrieved chunks, the model and the prompt version. Bumping
+the prompt version therefore invalidates every earlier entry.
+
+Two backends are available: an in-memory LRU (per process) and a local SQLite
+file (shared across processes and restarts) built on `SQLiteCache`. Both expire
+entries after a TTL.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Literal, Optional, Protocol
+
+from langchain_core.documents import Document
+from langchain_core.messages import AnyMessage
+
+from shared import clients
+from shared.cache import SQLiteCache
+from shared.lexical import content_key
+
+
+def _normalise(text: str) -> str:
+    """Casefold `text` and collapse its whitespace."""
+    return " ".join(text.casefold().split())
+
+
+def make_response_key(
+    messages: Iterable[AnyMessage],
+    documents: Iterable[Document],
+    model: str,
+    prompt_version: str,
+) -> str:
+    """Build the cache key of an answer.
+
+    Args:
+        messages (Iterable[AnyMessage]): Conversation tail the answer responds to.
+        documents (Iterable[Document]): Context chunks; only their IDs (or content hash) matter.
+        model (str): Name of the generation model.
+        prompt_version (str): Version of the generation prompt.
+
+    Returns:
+        str: A hex SHA-256 digest identifying the answer.
+    """
+    payload = {
+        "model": model,
+        "prompt_version": prompt_version,
+        "messages": [
+            [message.type, _normalise(str(message.content))] for message in messages
+        ],
+        "chunks": sorted(doc.id or content_key(doc) for doc in documents),
+    }
+    return hashlib.sha256(
+        json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+class ResponseCache(Protocol):
+    """Backend of the response cache."""
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached answer for `key`, or None on a miss or if expired."""
+        ...
+
+    def put(self, key: str, answer: str) -> None:
+        """Cache `answer` under `key`."""
+        ...
+
+
+class MemoryResponseCache:
+    """In-process LRU of answers with a TTL."""
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 86400.0) -> None:
+        """Keep at most `max_entries` answers, each for `ttl` seconds."""
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached answer for `key`, or None on a miss or if expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created, answer = entry
+            if time.time() - created > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return answer
+
+    def put(self, key: str, answer: str) -> None:
+        """Cache `answer` under `key`, evicting the least recently used entry when full."""
+        with self._lock:
+            self._entries[key] = (time.time(), answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SQLiteResponseCache(SQLiteCache):
+    """Answers persisted in a local SQLite file, with a TTL on top of size-based LRU."""
+
+    def __init__(self, path: str, ttl: float = 86400.0, **kwargs) -> None:
+        """Open (or create) the cache file; `kwargs` are passed to `SQLiteCache`."""
+        super().__init__(path, **kwargs)
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[str]:  # type: ignore[override]
+        """Return the cached answer for `key`, or None on a miss or if expired."""
+        value = super().get(key)
+        if value is None:
+            return None
+        entry = json.loads(value)
+        if time.time() - entry["created"] > self.ttl:
+            return None
+        return entry["answer"]
+
+    def put(self, key: str, answer: str) -> None:  # type: ignore[override]
+        """Cache `answer` under `key`."""
+        entry = {"created": time.time(), "answer": answer}
+        super().put(key, json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+
+
+def make_response_cache(
+    backend: Literal["memory", "sqlite"], *, max_entries: int, ttl: float
+) -> ResponseCache:
+    """Return the process-wide response cache of the given backend."""
+    match backend:
+        case "memory":
+            return clients.get_or_create(
+                ("response_cache", backend, max_entries, ttl),
+                lambda: MemoryResponseCache(max_entries=max_entries, ttl=ttl),
+            )
+        case "sqlite":
+            path = os.getenv("RESPONSE_CACHE_PATH", ".cache/responses.sqlite")
+            return clients.get_or_create(
+                ("response_cache", backend, path, ttl),
+                lambda: SQLiteResponseCache(path, ttl=ttl),
+            )
+        case _:
+            raise ValueError(f"Unsupported response cache backend: {backend}")
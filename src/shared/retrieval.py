@@ -1,48 +1,121 @@
 """Manage the configuration of various retrievers.
 
 This module provides functionality to create and manage retrievers for different
-vector store backends, specifically Elasticsearch, Pinecone, and MongoDB.
+vector store backends, specifically Pinecone and an in-process local store.
 """
 
+import asyncio
 import os
 from contextlib import contextmanager
-from typing import Generator
+from typing import Any, Generator, Optional
 
+from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 from langchain_core.runnables import RunnableConfig
-from langchain_core.vectorstores import VectorStoreRetriever
+from langchain_core.vectorstores import VectorStore, VectorStoreRetriever
 
+from shared import clients
+from shared.cache import SQLiteCache
 from shared.configuration import BaseConfiguration
+from shared.embeddings import CachedEmbeddings
+from shared.rate_limit import get_rate_limiter
 
 ## Encoder constructors
 
-def make_text_encoder(model: str) -> Embeddings:
-    """Connect to the configured text encoder."""
+
+def make_text_encoder(
+    model: str, *, batch_size: int = 64, max_concurrency: int = 4
+) -> Embeddings:
+    """Connect to the configured text encoder, behind a persistent embedding cache.
+
+    Encoders are shared process-wide, one per model and batching configuration.
+    """
+    return clients.get_or_create(
+        ("text_encoder", model, batch_size, max_concurrency),
+        lambda: _build_text_encoder(
+            model, batch_size=batch_size, max_concurrency=max_concurrency
+        ),
+    )
+
+
+def _build_text_encoder(
+    model: str, *, batch_size: int, max_concurrency: int
+) -> Embeddings:
+    """Build a cached text encoder for `model`."""
+    fully_specified_name = model
     provider, model = model.split("/", maxsplit=1)
+    underlying: Embeddings
     match provider:
         case "openai":
             from langchain_openai import OpenAIEmbeddings
 
-            return OpenAIEmbeddings(model=model)
+            underlying = OpenAIEmbeddings(model=model)
         case "cohere":
             from langchain_cohere import CohereEmbeddings
 
-            return CohereEmbeddings(model=model)  # type: ignore
+            underlying = CohereEmbeddings(model=model)  # type: ignore
         case _:
             raise ValueError(f"Unsupported embedding provider: {provider}")
 
+    cache_path = os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite")
+    return CachedEmbeddings(
+        underlying,
+        model=fully_specified_name,
+        cache=clients.get_or_create(
+            ("sqlite_cache", cache_path), lambda: SQLiteCache(cache_path)
+        ),
+        batch_size=batch_size,
+        max_concurrency=max_concurrency,
+        rate_limiter=get_rate_limiter(provider, model),
+    )
+
+
+def _as_retriever(
+    vstore: VectorStore, search_kwargs: Optional[dict[str, Any]]
+) -> VectorStoreRetriever:
+    """Wrap `vstore` in a retriever honouring k, score_threshold and filter."""
+    search_kwargs = {"k": 10, **(search_kwargs or {})}
+    search_type = (
+        "similarity_score_threshold"
+        if "score_threshold" in search_kwargs
+        else "similarity"
+    )
+    return vstore.as_retriever(search_type=search_type, search_kwargs=search_kwargs)
+
 
 @contextmanager
 def make_pinecone_retriever(
-    embedding_model: Embeddings
+    embedding_model: Embeddings, search_kwargs: Optional[dict[str, Any]] = None
 ) -> Generator[VectorStoreRetriever, None, None]:
     """Configure this agent to connect to a specific pinecone index."""
     from langchain_pinecone import PineconeVectorStore
 
-    vstore = PineconeVectorStore.from_existing_index(
-        os.environ["PINECONE_INDEX_NAME"], embedding=embedding_model
+    index_name = os.environ["PINECONE_INDEX_NAME"]
+    # The store is reused across runs to skip the index-describe round-trip;
+    # encoders are shared too, so their identity is a stable key.
+    vstore = clients.get_or_create(
+        ("pinecone", index_name, id(embedding_model)),
+        lambda: PineconeVectorStore.from_existing_index(
+            index_name, embedding=embedding_model
+        ),
     )
-    yield vstore.as_retriever(search_kwargs={"k": 10})
+    yield _as_retriever(vstore, search_kwargs)
+
+
+@contextmanager
+def make_local_retriever(
+    embedding_model: Embeddings, search_kwargs: Optional[dict[str, Any]] = None
+) -> Generator[VectorStoreRetriever, None, None]:
+    """Configure this agent to use the in-process, memory-mapped vector store."""
+    from shared.local_store import LocalVectorStore
+
+    path = os.getenv("LOCAL_VECTOR_STORE_PATH", ".cache/vector_store")
+    vstore = clients.get_or_create(
+        ("local_store", path, id(embedding_model)),
+        lambda: LocalVectorStore(path, embedding_model),
+    )
+    yield _as_retriever(vstore, search_kwargs)
+
 
 @contextmanager
 def make_retriever(
@@ -50,10 +123,22 @@ def make_retriever(
 ) -> Generator[VectorStoreRetriever, None, None]:
     """Create a retriever for the agent, based on the current configuration."""
     configuration = BaseConfiguration.from_runnable_config(config)
-    embedding_model = make_text_encoder(configuration.embedding_model)
+    embedding_model = make_text_encoder(
+        configuration.embedding_model,
+        batch_size=configuration.embedding_batch_size,
+        max_concurrency=configuration.embedding_max_concurrency,
+    )
     match configuration.retriever_provider:
         case "pinecone":
-            with make_pinecone_retriever(embedding_model) as retriever:
+            with make_pinecone_retriever(
+                embedding_model, configuration.search_kwargs
+            ) as retriever:
+                yield retriever
+
+        case "local":
+            with make_local_retriever(
+                embedding_model, configuration.search_kwargs
+            ) as retriever:
                 yield retriever
 
         case _:
@@ -62,3 +147,130 @@ def make_retriever(
                 f"Expected one of: {', '.join(BaseConfiguration.__annotations__['retriever_provider'].__args__)}\n"
                 f"Got: {configuration.retriever_provider}"
             )
+
+
+async def asearch_by_vector(
+    vstore: VectorStore,
+    embedding: list[float],
+    *,
+    k: int = 10,
+    filter: Optional[dict[str, Any]] = None,
+    score_threshold: Optional[float] = None,
+) -> list[Document]:
+    """Search `vstore` by vector, pushing the metadata filter down to the store.
+
+    Args:
+        vstore (VectorStore): The store to query.
+        embedding (list[float]): The query embedding.
+        k (int): Number of documents to return.
+        filter (Optional[dict[str, Any]]): Pinecone-style metadata filter.
+        score_threshold (Optional[float]): Minimum similarity of returned documents.
+    """
+    kwargs: dict[str, Any] = {"filter": filter} if filter else {}
+    if score_threshold is None:
+        return await vstore.asimilarity_search_by_vector(embedding, k=k, **kwargs)
+
+    # Pinecone and the local store name their scored search differently
+    search = getattr(vstore, "similarity_search_by_vector_with_score", None) or getattr(
+        vstore, "similarity_search_with_score_by_vector"
+    )
+    pairs = await asyncio.to_thread(search, embedding, k=k, **kwargs)
+    return [doc for doc, score in pairs if score >= score_threshold]
+
+
+async def asearch_with_vectors(
+    vstore: VectorStore,
+    embedding: list[float],
+    *,
+    k: int = 10,
+    filter: Optional[dict[str, Any]] = None,
+    score_threshold: Optional[float] = None,
+) -> list[tuple[Document, Optional[list[float]]]]:
+    """Search `vstore` by vector and return the stored vector of each hit.
+
+    The local store reads the vectors from its matrix and Pinecone returns them
+    with the matches (`include_values`), in the same round-trip as the search.
+    Other stores only return the documents, paired with None.
+
+    Args:
+        vstore (VectorStore): The store to query.
+        embedding (list[float]): The query embedding.
+        k (int): Number of documents to return.
+        filter (Optional[dict[str, Any]]): Pinecone-style metadata filter.
+        score_threshold (Optional[float]): Minimum similarity of returned documents.
+    """
+    from shared.local_store import LocalVectorStore
+
+    if isinstance(vstore, LocalVectorStore):
+        hits = await asyncio.to_thread(
+            vstore.similarity_search_with_vectors_by_vector,
+            embedding,
+            k,
+            filter or None,
+        )
+    elif _is_pinecone(vstore):
+        hits = await asyncio.to_thread(_pinecone_query, vstore, embedding, k, filter)
+    else:
+        docs = await asearch_by_vector(
+            vstore, embedding, k=k, filter=filter, score_threshold=score_threshold
+        )
+        return [(doc, None) for doc in docs]
+    return [
+        (doc, vector)
+        for doc, score, vector in hits
+        if score_threshold is None or score >= score_threshold
+    ]
+
+
+async def afetch_vectors(vstore: VectorStore, ids: list[str]) -> dict[str, list[float]]:
+    """Return the stored vectors of `ids`, for hits found by another retriever.
+
+    Unknown ids, and stores that cannot return their vectors, are left out.
+    """
+    from shared.local_store import LocalVectorStore
+
+    if not ids:
+        return {}
+    if isinstance(vstore, LocalVectorStore):
+        return vstore.get_vectors(ids)
+    if _is_pinecone(vstore):
+        response = await asyncio.to_thread(
+            vstore.index.fetch, ids=ids, namespace=vstore._namespace
+        )
+        return {id_: list(vector.values) for id_, vector in response.vectors.items()}
+    return {}
+
+
+def _is_pinecone(vstore: VectorStore) -> bool:
+    """Tell whether `vstore` is a Pinecone store, without requiring the package."""
+    try:
+        from langchain_pinecone import PineconeVectorStore
+    except ImportError:
+        return False
+    return isinstance(vstore, PineconeVectorStore)
+
+
+def _pinecone_query(
+    vstore: Any,
+    embedding: list[float],
+    k: int,
+    filter: Optional[dict[str, Any]],
+) -> list[tuple[Document, float, list[float]]]:
+    """Query a Pinecone store for the `k` nearest matches with their values."""
+    results = vstore.index.query(
+        vector=embedding,
+        top_k=k,
+        include_values=True,
+        include_metadata=True,
+        namespace=vstore._namespace,
+        filter=filter or None,
+    )
+    hits = []
+    for match in results["matches"]:
+        metadata = dict(match["metadata"] or {})
+        text = metadata.pop(vstore._text_key, None)
+        if text is None:
+            continue  # Not a chunk written by the indexer
+        document = Document(id=match["id"], page_content=text, metadata=metadata)
+        hits.append((document, match["score"], list(match["values"])))
+    return hits
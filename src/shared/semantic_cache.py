@@ -0,0 +1,115 @@
+"""In-memory semantic cache for retrieval results.
+
+Recurring questions (the same frost or drought question asked by many advisors
+during a weather event) rarely match word for word, but their embeddings are
+nearly identical. This cache stores recent query vectors with the documents they
+retrieved and serves those documents again when a new query falls within a
+cosine-similarity threshold, skipping the vector store entirely.
+
+Vectors are kept L2-normalised in a single matrix so a lookup is one
+matrix-vector product. Entries expire after a TTL and the oldest are evicted
+once the cache is full.
+"""
+
+import threading
+import time
+from typing import Any, Optional
+
+import numpy as np
+
+
+class SemanticCache:
+    """Cosine-similarity cache from query embeddings to retrieval results."""
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600.0) -> None:
+        """Create an empty cache.
+
+        Args:
+            max_entries (int): Number of queries kept before the oldest are evicted.
+            ttl (float): Seconds after which an entry is no longer served.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._vectors: Optional[np.ndarray] = None
+        self._values: list[Any] = []
+        self._tags: list[str] = []
+        self._created: list[float] = []
+        self._lock = threading.Lock()
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict[str, float]:
+        """Return hit/miss counters and current size, for logging or metrics."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "size": len(self._values),
+        }
+
+    def lookup(
+        self, vector: list[float], threshold: float, tag: str = ""
+    ) -> Optional[Any]:
+        """Return the value of the most similar cached query, if above `threshold`.
+
+        Only entries added with the same `tag` (e.g. a serialised search
+        filter) are considered.
+        """
+        query = _normalise(vector)
+        with self._lock:
+            self._expire()
+            if self._vectors is not None and len(self._values):
+                scores = self._vectors @ query
+                scores[np.asarray(self._tags) != tag] = -np.inf
+                best = int(np.argmax(scores))
+                if scores[best] >= threshold:
+                    self.hits += 1
+                    return self._values[best]
+            self.misses += 1
+            return None
+
+    def add(self, vector: list[float], value: Any, tag: str = "") -> None:
+        """Cache `value` for the query `vector`, evicting the oldest entry when full."""
+        row = _normalise(vector)[np.newaxis, :]
+        with self._lock:
+            self._expire()
+            if self._vectors is None or not len(self._values):
+                self._vectors = row
+            else:
+                self._vectors = np.vstack([self._vectors, row])
+            self._values.append(value)
+            self._tags.append(tag)
+            self._created.append(time.monotonic())
+            overflow = len(self._values) - self.max_entries
+            if overflow > 0:
+                self._drop(overflow)
+
+    def _expire(self) -> None:
+        """Drop entries older than the TTL (entries are kept in insertion order)."""
+        cutoff = time.monotonic() - self.ttl
+        expired = 0
+        while expired < len(self._created) and self._created[expired] < cutoff:
+            expired += 1
+        if expired:
+            self._drop(expired)
+
+    def _drop(self, count: int) -> None:
+        """Remove the `count` oldest entries."""
+        del self._values[:count]
+        del self._tags[:count]
+        del self._created[:count]
+        if self._vectors is not None:
+            self._vectors = self._vectors[count:]
+
+
+def _normalise(vector: list[float]) -> np.ndarray:
+    """Return `vector` as a unit-length float32 array."""
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
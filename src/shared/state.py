@@ -13,6 +13,11 @@ def _generate_uuid(page_content: str) -> str:
     return str(uuid.UUID(md5_hash))
 
 
+def generate_chunk_id(url: str, page_content: str) -> str:
+    """Generate a deterministic ID for a chunk from its source URL and content."""
+    return _generate_uuid(f"{url}\n{page_content}")
+
+
 def reduce_docs(
     existing: Optional[list[Document]],
     new: Union[
@@ -2,11 +2,25 @@
 
 Functions:
     format_docs: Convert documents to an xml-formatted string.
+    number_sources: Assign one citation number per source document.
+    format_context: Serialise documents as a numbered source table and tagged chunks.
     load_chat_model: Load a chat model from a model name.
+    hedged_call: Await a coroutine, racing a duplicate if the first one is slow.
+    encode_tokens: Tokenize text with a fast local tokenizer.
+    count_tokens: Count the tokens of a text.
+    truncate_tokens: Cut a text down to a number of tokens.
+    matches_filter: Check document metadata against a vector-store style filter.
+
+Classes:
+    LatencyTracker: Rolling window of call latencies with percentile lookup.
 """
 
-from typing import Optional
+import asyncio
+from collections import deque
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Literal, Optional, TypeVar
 
+import tiktoken
 from langchain.chat_models import init_chat_model
 from langchain_core.documents import Document
 from langchain_core.language_models import BaseChatModel
@@ -63,6 +77,80 @@ def format_docs(docs: Optional[list[Document]]) -> str:
 </documents>"""
 
 
+def number_sources(
+    docs: list[Document],
+) -> tuple[list[dict[str, str]], list[int]]:
+    """Assign one citation number per source document, in order of first appearance.
+
+    Chunks of the same report (same `url`, or same `title` without one) share a number.
+
+    Args:
+        docs (list[Document]): Context chunks.
+
+    Returns:
+        tuple[list[dict[str, str]], list[int]]: The sources (title, year, url),
+        numbered from 1 in list order, and the source number of each chunk.
+    """
+    sources: list[dict[str, str]] = []
+    numbers: dict[str, int] = {}
+    chunk_numbers = []
+    for doc in docs:
+        metadata = doc.metadata or {}
+        key = metadata.get("url") or metadata.get("title") or doc.page_content
+        if key not in numbers:
+            sources.append(
+                {
+                    "title": metadata.get("title", ""),
+                    "year": str(metadata.get("publication_year", "") or ""),
+                    "url": metadata.get("url", ""),
+                }
+            )
+            numbers[key] = len(sources)
+        chunk_numbers.append(numbers[key])
+    return sources, chunk_numbers
+
+
+def format_context(docs: Optional[list[Document]]) -> str:
+    """Serialise documents as a numbered source table followed by `[n]`-tagged chunks.
+
+    Titles, years and URLs appear once per source instead of once per chunk,
+    and the numbers match the `[n]` citations the generation prompt asks for.
+
+    Examples:
+        >>> docs = [
+        ...     Document(page_content="Hello", metadata={"title": "A", "publication_year": "2021", "url": "u"}),
+        ...     Document(page_content="World", metadata={"title": "A", "publication_year": "2021", "url": "u"}),
+        ... ]
+        >>> print(format_context(docs))
+        Sources :
+        [1] A (2021) u
+        <BLANKLINE>
+        Extraits :
+        [1] Hello
+        [1] World
+    """
+    if not docs:
+        return ""
+    sources, numbers = number_sources(docs)
+    table = "\n".join(
+        f"[{i}] "
+        + " ".join(
+            part
+            for part in (
+                source["title"],
+                f"({source['year']})" if source["year"] else "",
+                source["url"],
+            )
+            if part
+        )
+        for i, source in enumerate(sources, start=1)
+    )
+    chunks = "\n".join(
+        f"[{number}] {doc.page_content}" for number, doc in zip(numbers, docs)
+    )
+    return f"Sources :\n{table}\n\nExtraits :\n{chunks}"
+
+
 def load_chat_model(fully_specified_name: str) -> BaseChatModel:
     """Load a chat model from a fully specified name.
 
@@ -75,3 +163,194 @@ def load_chat_model(fully_specified_name: str) -> BaseChatModel:
         provider = ""
         model = fully_specified_name
     return init_chat_model(model, model_provider=provider)
+
+
+R = TypeVar("R")
+
+
+class LatencyTracker:
+    """Rolling window of call latencies, used to decide when to hedge a request."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20) -> None:
+        """Keep the last `window` latencies; percentiles need `min_samples` of them."""
+        self.samples: deque[float] = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float) -> None:
+        """Record the latency of a completed call."""
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Return the `q` quantile (0-1) of recent latencies, or None if too few samples."""
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+async def hedged_call(
+    make_call: Callable[[], Awaitable[R]], hedge_after: Optional[float]
+) -> R:
+    """Await `make_call()`, starting a duplicate call if the first has not finished after `hedge_after` seconds.
+
+    The first call to complete wins and the other one is cancelled.
+
+    Args:
+        make_call (Callable[[], Awaitable[R]]): Builds a fresh awaitable for each attempt.
+        hedge_after (Optional[float]): Delay before hedging, or None to never hedge.
+
+    Returns:
+        R: The result of whichever call finished first.
+    """
+    first = asyncio.ensure_future(make_call())
+    second: Optional[asyncio.Future[R]] = None
+    try:
+        if hedge_after is None:
+            return await first
+        done, _ = await asyncio.wait({first}, timeout=hedge_after)
+        if done:
+            return first.result()
+
+        second = asyncio.ensure_future(make_call())
+        pending = {first, second}
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+        # Both attempts failed: surface the error of the original call
+        return first.result()
+    finally:
+        for task in (first, second):
+            if task is not None:
+                task.cancel()
+
+
+# Characters per token assumed when no tiktoken encoding can be loaded
+_CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=4)
+def _get_encoding(name: str) -> Optional[tiktoken.Encoding]:
+    """Load a tiktoken encoding once per process, or None if it cannot be loaded.
+
+    tiktoken downloads its BPE files on first use (they can be shipped in
+    `TIKTOKEN_CACHE_DIR` instead); offline and without them, token counts fall
+    back to a character-based estimate.
+    """
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        print(
+            f"⚠️ tiktoken encoding {name} unavailable ({e}): "
+            f"estimating {_CHARS_PER_TOKEN} characters per token"
+        )
+        return None
+
+
+@lru_cache(maxsize=4096)
+def encode_tokens(text: str, encoding: str = "cl100k_base") -> tuple[int, ...]:
+    """Tokenize `text` locally.
+
+    Results are memoised, so texts seen on previous turns (earlier messages,
+    repeated chunks) are not tokenized again. Without the tiktoken encoding,
+    the "tokens" are the offsets of fixed-size character slices.
+
+    Args:
+        text (str): The text to tokenize.
+        encoding (str): Name of the tiktoken encoding.
+
+    Returns:
+        tuple[int, ...]: The token ids.
+    """
+    tokenizer = _get_encoding(encoding)
+    if tokenizer is None:
+        return tuple(range(0, len(text), _CHARS_PER_TOKEN))
+    return tuple(tokenizer.encode(text, disallowed_special=()))
+
+
+def count_tokens(text: str, encoding: str = "cl100k_base") -> int:
+    """Return the number of tokens in `text`."""
+    return len(encode_tokens(text, encoding))
+
+
+def truncate_tokens(
+    text: str,
+    max_tokens: int,
+    *,
+    keep: Literal["head", "tail"] = "head",
+    encoding: str = "cl100k_base",
+) -> str:
+    """Cut `text` down to at most `max_tokens` tokens.
+
+    Args:
+        text (str): The text to truncate.
+        max_tokens (int): Token budget.
+        keep (Literal["head", "tail"]): Which end of the text to keep.
+        encoding (str): Name of the tiktoken encoding.
+    """
+    tokens = encode_tokens(text, encoding)
+    if len(tokens) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+    kept = tokens[:max_tokens] if keep == "head" else tokens[-max_tokens:]
+    tokenizer = _get_encoding(encoding)
+    if tokenizer is None:
+        # Fallback tokens are character offsets
+        if keep == "head":
+            return text[: kept[-1] + _CHARS_PER_TOKEN]
+        return text[kept[0] :]
+    return tokenizer.decode(list(kept))
+
+
+_FILTER_OPERATORS: dict[str, Callable[[Any, Any], bool]] = {
+    "$eq": lambda value, target: value == target,
+    "$ne": lambda value, target: value != target,
+    "$in": lambda value, target: value in target,
+    "$nin": lambda value, target: value not in target,
+    "$gt": lambda value, target: value is not None and value > target,
+    "$gte": lambda value, target: value is not None and value >= target,
+    "$lt": lambda value, target: value is not None and value < target,
+    "$lte": lambda value, target: value is not None and value <= target,
+}
+
+
+def matches_filter(metadata: dict[str, Any], filter: dict[str, Any]) -> bool:
+    """Check `metadata` against a Pinecone-style metadata filter.
+
+    Supports plain equality (`{"publisher": "ACTA"}`), the comparison operators
+    `$eq`, `$ne`, `$in`, `$nin`, `$gt`, `$gte`, `$lt`, `$lte`, and `$and`/`$or`
+    lists, so that stores without native filtering behave like Pinecone.
+
+    Args:
+        metadata (dict[str, Any]): Metadata of a document.
+        filter (dict[str, Any]): The filter to apply.
+
+    Returns:
+        bool: True if the document passes the filter.
+
+    Examples:
+        >>> matches_filter({"publication_year": "2022"}, {"publication_year": {"$in": ["2021", "2022"]}})
+        True
+    """
+    for field, condition in filter.items():
+        if field == "$and":
+            if not all(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif field == "$or":
+            if not any(matches_filter(metadata, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(field)
+            for operator, target in condition.items():
+                try:
+                    if not _FILTER_OPERATORS[operator](value, target):
+                        return False
+                except TypeError:
+                    return False
+        elif metadata.get(field) != condition:
+            return False
+    return True
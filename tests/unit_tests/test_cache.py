@@ -0,0 +1,26 @@
+import sqlite3
+import time
+
+from shared.cache import SQLiteCache
+
+
+def test_hits_are_buffered_and_count_for_eviction(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = SQLiteCache(path, max_bytes=20)
+    cache.put("a", b"x" * 8)
+    time.sleep(0.01)
+    cache.put("b", b"x" * 8)
+    time.sleep(0.01)
+    assert cache.get("a") == b"x" * 8
+    # The hit is not written by the read itself
+    (last_access,) = (
+        sqlite3.connect(path)
+        .execute("SELECT last_access FROM entries WHERE key = 'a'")
+        .fetchone()
+    )
+    assert last_access < time.time() - 0.01
+
+    # ... but the next put writes it before evicting: "b" is the oldest now
+    cache.put("c", b"x" * 8)
+    assert cache.get_many(["a", "b", "c"]).keys() == {"a", "c"}
+    cache.close()
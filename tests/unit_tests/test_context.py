@@ -0,0 +1,59 @@
+import pytest
+from langchain_core.documents import Document
+
+from retrieval_graph import context
+from retrieval_graph.context import merge_overlapping, mmr_order, pack_documents
+
+OVERLAP = "la fertilisation azotée du blé tendre en sortie d'hiver "
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    # Count words instead of tiktoken tokens: no encoding download in tests
+    monkeypatch.setattr(context, "count_tokens", lambda text: len(text.split()))
+
+
+def doc(text, url="https://example.org/a.pdf"):
+    return Document(page_content=text, metadata={"url": url})
+
+
+def test_mmr_order_prefers_diversity():
+    query = [1.0, 0.0]
+    vectors = [[1.0, 0.0], [0.99, 0.01], [0.6, 0.8]]
+    assert mmr_order(query, vectors, lambda_mult=1.0) == [0, 1, 2]
+    assert mmr_order(query, vectors, lambda_mult=0.3) == [0, 2, 1]
+
+
+def test_merge_overlapping_chunks_of_the_same_document():
+    left = doc("Premier passage sur " + OVERLAP)
+    right = doc(OVERLAP + "et second passage.")
+    other = doc(OVERLAP + "ailleurs.", url="https://example.org/b.pdf")
+    merged = merge_overlapping([left, right, other])
+    assert [d.page_content for d in merged] == [
+        "Premier passage sur " + OVERLAP + "et second passage.",
+        other.page_content,
+    ]
+
+
+def test_pack_documents_dedupes_and_respects_budget():
+    docs = [
+        doc("un deux trois", url="a"),
+        doc("un deux trois", url="a"),
+        doc("quatre cinq six sept", url="b"),
+        doc("huit", url="c"),
+    ]
+    packed = pack_documents(docs, token_budget=5)
+    # The duplicate is dropped and the 4-word chunk does not fit after the first
+    assert [d.page_content for d in packed] == ["un deux trois", "huit"]
+
+
+def test_pack_documents_orders_by_mmr_when_vectors_are_given():
+    docs = [doc("a", url="a"), doc("b", url="b"), doc("c", url="c")]
+    packed = pack_documents(
+        docs,
+        token_budget=2,
+        query_vector=[0.0, 1.0],
+        doc_vectors=[[1.0, 0.0], [0.0, 1.0], [0.1, 0.9]],
+        lambda_mult=1.0,
+    )
+    assert [d.page_content for d in packed] == ["b", "c"]
@@ -0,0 +1,55 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from retrieval_graph import history
+from retrieval_graph.history import window_start
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    # Count words instead of tiktoken tokens: no encoding download in tests
+    monkeypatch.setattr(history, "count_tokens", lambda text: len(text.split()))
+
+
+def turns(count, words=3):
+    """`count` question/answer turns of `words` words per message."""
+    messages = []
+    for i in range(count):
+        messages.append(HumanMessage(" ".join([f"question{i}"] * words)))
+        messages.append(AIMessage(" ".join([f"réponse{i}"] * words)))
+    return messages
+
+
+def test_latest_turn_is_kept_even_over_budget():
+    messages = turns(3, words=50)
+    assert window_start(messages, token_budget=10, max_turns=5) == 4
+
+
+def test_budget_and_turn_limit():
+    messages = turns(4)  # 6 words per turn
+    assert window_start(messages, token_budget=12, max_turns=5) == 4
+    assert window_start(messages, token_budget=100, max_turns=3) == 2
+    assert window_start(messages, token_budget=100, max_turns=5) == 0
+
+
+def test_without_human_message_nothing_is_windowed():
+    messages = [AIMessage("bienvenue " * 50)]
+    assert window_start(messages, token_budget=10, max_turns=1) == 0
+    assert window_start([], token_budget=10, max_turns=1) == 0
+
+
+def test_growing_conversation_folds_only_the_delta():
+    messages = []
+    summarized = 0
+    folded = []
+    for i in range(5):
+        messages += turns(i + 1)[-2:]
+        start = window_start(messages, token_budget=12, max_turns=5)
+        assert start >= summarized
+        # Only the messages that just left the window are summarised
+        folded.append(messages[summarized:start])
+        summarized = start
+    assert [len(delta) for delta in folded] == [0, 0, 2, 2, 2]
+    assert [m.content for delta in folded for m in delta] == [
+        m.content for m in messages[:6]
+    ]
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from index_graph.incremental import (
+    ValidatorStore,
+    make_chunk_manifest,
+    upsert_document,
+)
+from shared.lexical import make_lexical_index
+from shared.local_store import LocalVectorStore
+
+URL = "https://example.org/rapport.pdf"
+
+
+class FlakyEmbeddings(Embeddings):
+    """Fails on every text containing "panne" while `failing` is set."""
+
+    def __init__(self):
+        self.failing = True
+
+    def embed_documents(self, texts):
+        if self.failing and any("panne" in text for text in texts):
+            raise RuntimeError("provider unavailable")
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHUNK_MANIFEST_PATH", str(tmp_path / "manifest.sqlite"))
+    monkeypatch.setenv("LEXICAL_INDEX_PATH", str(tmp_path / "lexical.sqlite"))
+    return LocalVectorStore(str(tmp_path / "store"), FlakyEmbeddings())
+
+
+def upsert(store, texts, **kwargs):
+    docs = [Document(page_content=text, metadata={"url": URL}) for text in texts]
+    return asyncio.run(
+        upsert_document(
+            store.as_retriever(), URL, docs, batch_size=2, max_retries=0, **kwargs
+        )
+    )
+
+
+def test_failed_batch_is_left_out_of_the_manifest(store):
+    texts = ["blé tendre", "orge d'hiver", "colza en panne", "maïs grain"]
+    assert upsert(store, texts) == (2, 0, 2)
+    indexed = make_chunk_manifest().get(URL)
+    assert len(indexed) == 2
+    assert {doc.page_content for doc in store.get_by_ids(sorted(indexed))} == {
+        "blé tendre",
+        "orge d'hiver",
+    }
+
+    # The next run only writes the chunks of the failed batch
+    store.embeddings.failing = False
+    assert upsert(store, texts) == (2, 0, 0)
+    assert len(make_chunk_manifest().get(URL)) == 4
+    assert upsert(store, texts) == (0, 0, 0)
+
+
+def test_removed_chunks_are_deleted(store):
+    store.embeddings.failing = False
+    assert upsert(store, ["blé tendre", "orge d'hiver", "maïs grain"]) == (3, 0, 0)
+    assert upsert(store, ["blé tendre", "betteraves"]) == (1, 2, 0)
+    indexed = make_chunk_manifest().get(URL)
+    assert {doc.page_content for doc in store.get_by_ids(sorted(indexed))} == {
+        "blé tendre",
+        "betteraves",
+    }
+    assert [doc.id for doc in make_lexical_index().search("orge")] == []
+
+
+def test_failed_delete_is_counted_and_retried(store, monkeypatch):
+    store.embeddings.failing = False
+    upsert(store, ["blé tendre", "orge d'hiver"])
+
+    async def broken_delete(ids=None, **kwargs):
+        raise RuntimeError("store unavailable")
+
+    monkeypatch.setattr(store, "adelete", broken_delete)
+    assert upsert(store, ["blé tendre"]) == (0, 0, 1)
+    # The chunk is still in the store, so it stays in the manifest
+    assert len(make_chunk_manifest().get(URL)) == 2
+
+    monkeypatch.delattr(store, "adelete")
+    assert upsert(store, ["blé tendre"]) == (0, 1, 0)
+    assert len(make_chunk_manifest().get(URL)) == 1
+
+
+def test_validator_store(tmp_path):
+    validators = ValidatorStore(str(tmp_path / "validators.sqlite"))
+    assert validators.get(URL) == {}
+    validators.set(URL, {"etag": None, "last_modified": None})
+    assert validators.get(URL) == {}
+    validators.set(URL, {"etag": '"abc"', "last_modified": None})
+    validators.close()
+
+    reopened = ValidatorStore(str(tmp_path / "validators.sqlite"))
+    assert reopened.get(URL) == {"etag": '"abc"'}
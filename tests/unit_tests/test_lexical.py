@@ -0,0 +1,77 @@
+from langchain_core.documents import Document
+
+from shared.lexical import LexicalIndex, fold, reciprocal_rank_fusion, tokenize
+
+
+def make_index(tmp_path) -> LexicalIndex:
+    index = LexicalIndex(str(tmp_path / "lexical.sqlite"))
+    index.add_documents(
+        [
+            Document(
+                id="1",
+                page_content="Fertilisation azotée du blé tendre : doses d'azote.",
+                metadata={"publisher": "Arvalis", "publication_year": 2021},
+            ),
+            Document(
+                id="2",
+                page_content="Le blé dur en Provence.",
+                metadata={"publisher": "INRAE", "publication_year": 2023},
+            ),
+            Document(
+                id="3",
+                page_content="Irrigation du maïs et stress hydrique.",
+                metadata={"publisher": "Arvalis", "publication_year": 2023},
+            ),
+        ]
+    )
+    return index
+
+
+def ids(docs):
+    return [doc.id for doc in docs]
+
+
+def test_tokenize_folds_and_stems():
+    assert fold("Blé Été") == "ble ete"
+    assert tokenize("L'azote des fertilisations") == tokenize("azote fertilisation")
+    assert tokenize("le la les") == []
+
+
+def test_bm25_ranking(tmp_path):
+    index = make_index(tmp_path)
+    # Both mention wheat; only the first one mentions nitrogen, twice
+    assert ids(index.search("azote blé")) == ["1", "2"]
+    assert ids(index.search("irrigation")) == ["3"]
+    assert index.search("vigne") == []
+    assert index.search("le la") == []
+
+
+def test_search_filters(tmp_path):
+    index = make_index(tmp_path)
+    assert ids(index.search("blé", filter={"publisher": "INRAE"})) == ["2"]
+    assert ids(
+        index.search("blé irrigation", filter={"publication_year": {"$gte": 2023}})
+    ) in (
+        ["2", "3"],
+        ["3", "2"],
+    )
+    assert ids(index.search("azote blé", k=1)) == ["1"]
+
+
+def test_delete_and_reopen(tmp_path):
+    index = make_index(tmp_path)
+    index.delete(["1"])
+    # Adding an id that is already indexed leaves it unchanged
+    index.add_documents([Document(id="2", page_content="Vigne en Bourgogne.")])
+    index.close()
+
+    reopened = LexicalIndex(str(tmp_path / "lexical.sqlite"))
+    assert ids(reopened.search("azote blé")) == ["2"]
+    assert reopened.search("vigne") == []
+
+
+def test_reciprocal_rank_fusion():
+    a, b, c = (Document(page_content=text) for text in ("a", "b", "c"))
+    fused = reciprocal_rank_fusion([[a, b], [b, c]])
+    assert [doc.page_content for doc in fused] == ["b", "a", "c"]
+    assert len(reciprocal_rank_fusion([[a, b], [b, c]], limit=1)) == 1
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import os
+import time
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from shared import local_store
+from shared.local_store import LocalVectorStore
+from shared.retrieval import afetch_vectors, asearch_with_vectors
+
+VECTORS = {
+    "blé": [1.0, 0.0, 0.0],
+    "orge": [0.9, 0.1, 0.0],
+    "vigne": [0.0, 1.0, 0.0],
+    "maïs": [0.0, 0.0, 1.0],
+}
+
+
+class FakeEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [VECTORS[text] for text in texts]
+
+    def embed_query(self, text):
+        return VECTORS[text]
+
+
+def make_store(path) -> LocalVectorStore:
+    return LocalVectorStore(str(path), FakeEmbeddings())
+
+
+def search(store, text, k=4, **kwargs):
+    return [doc.id for doc in store.similarity_search(text, k=k, **kwargs)]
+
+
+def test_add_and_search(tmp_path):
+    store = make_store(tmp_path)
+    store.add_texts(
+        ["blé", "orge", "vigne"],
+        [{"publisher": "A"}, {"publisher": "B"}, {"publisher": "A"}],
+        ids=["1", "2", "3"],
+    )
+    assert search(store, "blé", k=2) == ["1", "2"]
+    assert search(store, "blé", k=2, filter={"publisher": "A"}) == ["1", "3"]
+    assert [doc.page_content for doc in store.get_by_ids(["3"])] == ["vigne"]
+
+
+def test_delete_and_replace(tmp_path):
+    store = make_store(tmp_path)
+    store.add_texts(["blé", "orge", "vigne"], ids=["1", "2", "3"])
+    store.delete(["1"])
+    assert search(store, "blé") == ["2", "3"]
+    # Re-adding an id replaces its previous row
+    store.add_texts(["maïs"], ids=["2"])
+    assert set(search(store, "blé")) == {"2", "3"}
+    assert search(store, "maïs", k=1) == ["2"]
+    assert store.get_by_ids(["1"]) == []
+
+
+def test_reopen(tmp_path):
+    store = make_store(tmp_path)
+    store.add_texts(["blé", "orge", "vigne"], ids=["1", "2", "3"])
+    store.delete(["2"])
+    store.close()
+    store.add_texts(["maïs"], ids=["4"])
+
+    reopened = make_store(tmp_path)
+    assert search(reopened, "blé")[0] == "1"
+    assert set(search(reopened, "blé")) == {"1", "3", "4"}
+    assert search(reopened, "maïs", k=1) == ["4"]
+
+
+def test_reopen_after_interrupted_write(tmp_path):
+    store = make_store(tmp_path)
+    store.add_texts(["blé", "vigne"], ids=["1", "2"])
+    store.close()
+    # A crash during the next append: vectors and part of a sidecar line
+    # written, meta file not updated
+    with open(os.path.join(tmp_path, "vectors.f32"), "ab") as f:
+        f.write(b"\0" * 10)
+    with open(os.path.join(tmp_path, "docs.jsonl"), "a", encoding="utf-8") as f:
+        f.write(json.dumps({"id": "3", "text": "orge", "metadata": {}}) + "\n")
+        f.write('{"id": "4", "te')
+
+    reopened = make_store(tmp_path)
+    assert search(reopened, "blé") == ["1", "2"]
+    assert reopened.get_by_ids(["3", "4"]) == []
+    assert os.path.getsize(os.path.join(tmp_path, "vectors.f32")) == 2 * 3 * 4
+
+    # Appending after the recovery lines up rows and vectors again
+    reopened.add_texts(["maïs"], ids=["5"])
+    again = make_store(tmp_path)
+    assert search(again, "maïs", k=1) == ["5"]
+    assert set(search(again, "blé")) == {"1", "2", "5"}
+
+
+def test_search_returns_the_stored_vectors(tmp_path):
+    store = make_store(tmp_path)
+    store.add_texts(["blé", "orge", "vigne"], ids=["1", "2", "3"])
+    hits = asyncio.run(
+        asearch_with_vectors(store, VECTORS["blé"], k=2, score_threshold=0.5)
+    )
+    assert [doc.id for doc, _ in hits] == ["1", "2"]
+    assert hits[0][1] == pytest.approx(VECTORS["blé"])
+    # Stored vectors are unit length
+    assert sum(x * x for x in hits[1][1]) == pytest.approx(1.0)
+
+    vectors = asyncio.run(afetch_vectors(store, ["3", "inconnu"]))
+    assert list(vectors) == ["3"]
+    assert vectors["3"] == pytest.approx(VECTORS["vigne"])
+
+
+def test_missing_index_is_rebuilt_in_the_background(tmp_path, monkeypatch):
+    pytest.importorskip("hnswlib")
+    store = make_store(tmp_path)
+    store.add_texts(["blé", "orge", "vigne"], ids=["1", "2", "3"])
+    store.delete(["2"])
+    store.close()
+    os.remove(os.path.join(tmp_path, "hnsw.bin"))
+    monkeypatch.setattr(local_store, "BACKGROUND_BUILD_ROWS", 0)
+
+    reopened = make_store(tmp_path)
+    # Searches scan the matrix while the index is built
+    assert search(reopened, "blé") == ["1", "3"]
+    deadline = time.monotonic() + 5
+    while reopened._hnsw is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert reopened._hnsw is not None
+    assert os.path.exists(os.path.join(tmp_path, "hnsw.bin"))
+    assert search(reopened, "blé") == ["1", "3"]
+
+
+def test_files_without_meta_are_uncommitted(tmp_path):
+    # A crash during the very first append, before the meta file was written
+    with open(os.path.join(tmp_path, "vectors.f32"), "wb") as f:
+        f.write(b"\0" * 12)
+    with open(os.path.join(tmp_path, "docs.jsonl"), "w", encoding="utf-8") as f:
+        f.write(json.dumps({"id": "1", "text": "blé", "metadata": {}}) + "\n")
+
+    store = make_store(tmp_path)
+    assert store.get_by_ids(["1"]) == []
+    store.add_texts(["vigne"], ids=["2"])
+    assert search(make_store(tmp_path), "vigne") == ["2"]
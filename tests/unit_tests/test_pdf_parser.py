@@ -0,0 +1,159 @@
+import asyncio
+import base64
+from types import SimpleNamespace
+
+import anthropic
+import fitz
+import httpx
+import pytest
+
+from index_graph.pdf_parser import PDFParser, _gather_or_cancel, _page_profile
+from shared import clients
+
+
+def form_page_pdf(*texts):
+    """PDF whose pages each show another page as a form XObject."""
+    doc = fitz.open()
+    for text in texts:
+        source = fitz.open()
+        source.new_page().insert_text((72, 72), text)
+        page = doc.new_page()
+        page.show_pdf_page(page.rect, source, 0)
+    return doc
+
+
+def scanned_pdf(pages):
+    """PDF of image-only pages, all sent to the LLM."""
+    doc = fitz.open()
+    pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 50, 50), False)
+    for i in range(pages):
+        pixmap.clear_with(i * 30)
+        doc.new_page().insert_image(fitz.Rect(0, 0, 595, 842), pixmap=pixmap)
+    return doc.tobytes()
+
+
+class StubClient:
+    """Anthropic client whose answers are given by `respond(pages)`."""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.calls = []
+        self.messages = SimpleNamespace(
+            with_raw_response=SimpleNamespace(create=self.create)
+        )
+
+    async def create(self, **kwargs):
+        data = kwargs["messages"][0]["content"][0]["source"]["data"]
+        pages = len(fitz.open(stream=base64.b64decode(data), filetype="pdf"))
+        self.calls.append(pages)
+        text, stop_reason = self.respond(pages)
+        response = SimpleNamespace(
+            content=[SimpleNamespace(text=text)],
+            stop_reason=stop_reason,
+            usage=SimpleNamespace(input_tokens=1, output_tokens=1),
+        )
+        return SimpleNamespace(headers={}, parse=lambda: response)
+
+
+@pytest.fixture
+def parser(tmp_path, monkeypatch):
+    monkeypatch.setenv("EXTRACTION_CACHE_PATH", str(tmp_path / "extraction.sqlite"))
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+    parser = PDFParser(process_workers=1)
+    parser.retry_delay = 0
+    yield parser
+    asyncio.run(clients.shutdown_clients())
+
+
+def test_page_digest_covers_form_xobjects():
+    doc = form_page_pdf("alpha alpha alpha", "omega omega omega")
+    # Same content stream, different form content
+    assert doc[0].read_contents() == doc[1].read_contents()
+    assert _page_profile(doc, 0)["digest"] != _page_profile(doc, 1)["digest"]
+
+
+def test_page_digest_is_stable_across_documents():
+    first = form_page_pdf("alpha alpha alpha")
+    second = form_page_pdf("beta", "alpha alpha alpha")
+    assert _page_profile(first, 0)["digest"] == _page_profile(first, 0)["digest"]
+    assert _page_profile(first, 0)["digest"] == _page_profile(second, 1)["digest"]
+
+
+def test_connection_errors_are_retried(parser):
+    failures = [anthropic.APITimeoutError(httpx.Request("POST", "https://api"))]
+
+    def respond(pages):
+        if failures:
+            raise failures.pop()
+        return "texte", "end_turn"
+
+    parser.client = StubClient(respond)
+    text, complete = asyncio.run(parser.extract_text_from_pdf(scanned_pdf(2)))
+    assert (text, complete) == ("texte", True)
+    assert len(parser.client.calls) == 2
+
+
+def test_failure_cancels_sibling_tasks():
+    async def main():
+        started = asyncio.Event()
+        sibling_cancelled = False
+
+        async def slow():
+            nonlocal sibling_cancelled
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                sibling_cancelled = True
+                raise
+
+        async def broken():
+            await started.wait()
+            raise RuntimeError("chunk illisible")
+
+        with pytest.raises(RuntimeError):
+            await _gather_or_cancel(slow(), broken())
+        return sibling_cancelled
+
+    assert asyncio.run(main())
+
+
+def truncated_above_one_page(pages):
+    # Multi-page chunks overflow the output, single pages fit
+    return f"page{pages}", "max_tokens" if pages > 1 else "end_turn"
+
+
+def test_truncated_chunks_are_split_and_cached(parser):
+    parser.client = StubClient(truncated_above_one_page)
+    parser.max_chunk_tokens = 10_000  # All four pages in one chunk
+    pdf = scanned_pdf(4)
+    text, complete = asyncio.run(parser.extract_text_from_pdf(pdf))
+    assert complete
+    assert text == "\n\n".join(["page1"] * 4)
+    # The 4-page chunk, its two halves, then the four single pages
+    assert sorted(parser.client.calls) == [1, 1, 1, 1, 2, 2, 4]
+    assert parser.last_stats["llm_calls"] == 7
+
+    # The split result is cached under the original chunk
+    parser.client.calls.clear()
+    assert asyncio.run(parser.extract_text_from_pdf(pdf)) == (text, True)
+    assert parser.client.calls == []
+
+
+def test_call_budget_leaves_the_extraction_incomplete(parser):
+    parser.client = StubClient(truncated_above_one_page)
+    parser.max_chunk_tokens = 10_000
+    parser.max_calls_per_document = 3
+    text, complete = asyncio.run(parser.extract_text_from_pdf(scanned_pdf(4)))
+    assert not complete
+    assert len(parser.client.calls) == 3
+    assert text == ""
+
+
+def test_zero_call_budget_is_kept(parser, monkeypatch):
+    assert PDFParser(max_calls_per_document=0).max_calls_per_document == 0
+    monkeypatch.setenv("PDF_MAX_CALLS_PER_DOCUMENT", "0")
+    parser = PDFParser()
+    parser.client = StubClient(truncated_above_one_page)
+    assert asyncio.run(parser.extract_text_from_pdf(scanned_pdf(1))) == ("", False)
+    assert parser.client.calls == []
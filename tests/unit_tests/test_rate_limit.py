@@ -0,0 +1,62 @@
+import asyncio
+
+from shared.rate_limit import (
+    BACKGROUND,
+    INTERACTIVE,
+    RateLimiter,
+    current_priority,
+    priority,
+)
+
+
+def test_priority_context():
+    assert current_priority() == INTERACTIVE
+    with priority(BACKGROUND):
+        assert current_priority() == BACKGROUND
+    assert current_priority() == INTERACTIVE
+
+
+def test_interactive_callers_go_first():
+    async def main():
+        # Empty request bucket, refilled by one request every 50 ms
+        limiter = RateLimiter(requests_per_minute=1200, tokens_per_minute=1_000_000)
+        limiter._requests.level = 0
+        order = []
+
+        async def call(name, level):
+            await limiter.acquire(level=level)
+            order.append(name)
+
+        # Background callers are queued first, the interactive one last
+        tasks = [asyncio.create_task(call(f"bg{i}", BACKGROUND)) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(call("interactive", INTERACTIVE)))
+        await asyncio.gather(*tasks)
+        return order
+
+    order = asyncio.run(main())
+    assert order[0] == "interactive"
+    assert order[1:] == ["bg0", "bg1", "bg2"]
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def main():
+        limiter = RateLimiter(requests_per_minute=1200, tokens_per_minute=1_000_000)
+        limiter._requests.level = 0
+        waiter = asyncio.create_task(limiter.acquire(level=INTERACTIVE))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        # The next caller is not stuck behind the cancelled ticket
+        await asyncio.wait_for(limiter.acquire(level=BACKGROUND), timeout=1)
+
+    asyncio.run(main())
+
+
+def test_headers_resize_the_buckets():
+    limiter = RateLimiter(requests_per_minute=500, tokens_per_minute=200_000)
+    limiter.update_from_headers(
+        {"x-ratelimit-limit-requests": "100", "x-ratelimit-remaining-tokens": "10"}
+    )
+    assert limiter._requests.capacity == 100
+    assert limiter._tokens.level <= 10
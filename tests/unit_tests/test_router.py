@@ -0,0 +1,47 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from retrieval_graph.router import classify, direct_reply, latest_question
+from shared.lexical import tokenize
+
+
+@pytest.mark.parametrize(
+    "question", ["Bonjour !", "merci beaucoup", "Super, à bientôt"]
+)
+def test_small_talk_is_answered_directly(question):
+    assert classify(question, True) == "reply"
+    assert classify(question, False) == "reply"
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "Et pour les vignes en Bourgogne ?",
+        "Peux-tu préciser les doses d'azote pour le maïs ?",
+        "Quels rendements pour le colza en Beauce ?",
+        "?",
+    ],
+)
+def test_new_questions_are_retrieved(question):
+    assert classify(question, True) == "retrieve"
+
+
+def test_follow_ups_reuse_the_documents():
+    known = set(tokenize("rentabilité économique du blé tendre en Beauce"))
+    assert classify("Peux-tu développer ?", True) == "reuse"
+    assert classify("Plus de détails stp", True) == "reuse"
+    assert classify("Précise le volet économique", True, known) == "reuse"
+    assert classify("Et pour le blé ?", True, known) == "reuse"
+    # Without documents in the state there is nothing to reuse
+    assert classify("Peux-tu développer ?", False) == "retrieve"
+    # A new term, even after a follow-up marker, needs a retrieval
+    assert classify("Précise le volet économique", True) == "retrieve"
+    assert classify("Et pour les vignes ?", True, known) == "retrieve"
+
+
+def test_direct_reply_and_latest_question():
+    assert direct_reply("Bonjour").startswith("Bonjour")
+    assert direct_reply("merci").startswith("Avec plaisir")
+    messages = [HumanMessage("première"), AIMessage("réponse"), HumanMessage("seconde")]
+    assert latest_question(messages) == "seconde"
+    assert latest_question([]) == ""
@@ -0,0 +1,28 @@
+import pytest
+import tiktoken
+
+from shared import utils
+from shared.utils import count_tokens, truncate_tokens
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    def unavailable(name):
+        raise ConnectionError("no network")
+
+    monkeypatch.setattr(tiktoken, "get_encoding", unavailable)
+    utils._get_encoding.cache_clear()
+    utils.encode_tokens.cache_clear()
+    yield
+    utils._get_encoding.cache_clear()
+    utils.encode_tokens.cache_clear()
+
+
+def test_token_helpers_work_without_the_encoding(offline):
+    text = "fertilisation azotée du blé"  # 27 characters
+    assert count_tokens(text) == 7
+    assert count_tokens("") == 0
+    assert truncate_tokens(text, 7) == text
+    assert truncate_tokens(text, 2) == "fertilis"
+    assert truncate_tokens(text, 2, keep="tail") == " du blé"
+    assert truncate_tokens(text, 0) == ""